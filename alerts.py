@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+import pandas as pd
+import streamlit as st
+from cache import cached, invalidate
+from database import get_repository
+
+# --- ⚙️ CONFIGURATION ---
+OUTBOX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_outbox")
+DEFAULT_WINDOW_DAYS = 30
+URGENCY_BANDS = (7, 14, 30)  # "due within N days" buckets shown in the digest
+DIGEST_TTL = 3600  # seconds; also rebuilt on any assets write in this process
+DIGEST_COLUMNS = ["id", "item_name", "reference_no", "department", "supplier", "expiry_date", "days_left"]
+
+def get_window_days():
+    try: return int(st.secrets["alerts"]["window_days"])
+    except Exception: return DEFAULT_WINDOW_DAYS
+
+def _digest_path(day, ext="json"):
+    return os.path.join(OUTBOX_DIR, f"digest-{day}.{ext}")
+
+# --- ⏰ EXPIRY QUERIES ---
+
+def get_expiring(days=None, today=None):
+    """Assets whose expiry_date falls in [today, today + days], soonest first (None if the query failed).
+    A range scan on idx_assets_expiry_date; cached per day and dropped when assets are written."""
+    days = days if days is not None else get_window_days()
+    today = today or date.today()
+    return cached("assets", ("expiring", str(today), days), lambda: _load_expiring(today, days))
+
+def _load_expiring(today, days):
+    filters = [("gte", "expiry_date", today), ("lte", "expiry_date", today + timedelta(days=days))]
+    try:
+        pages = get_repository().iter_pages("assets", columns=", ".join(DIGEST_COLUMNS[:-1]), filters=filters,
+                                            order_by=("expiry_date", "id"))
+        rows = [row for page in pages for row in page]
+    except Exception as e:
+        print(f"Expiry Error: {e}")
+        return None
+    df = pd.DataFrame(rows, columns=DIGEST_COLUMNS[:-1])
+    df["days_left"] = (pd.to_datetime(df["expiry_date"]) - pd.Timestamp(today)).dt.days
+    return df
+
+def count_expired(today=None):
+    today = today or date.today()
+    def load():
+        try: return get_repository().count("assets", [("lt", "expiry_date", today)])
+        except Exception: return 0
+    return cached("assets", ("expired", str(today)), load)
+
+# --- 📬 DAILY DIGEST ---
+
+def build_digest(today=None, days=None):
+    today = today or date.today()
+    days = days if days is not None else get_window_days()
+    df = get_expiring(days, today)
+    if df is None: return None
+    return {
+        "date": str(today), "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "window_days": days, "expired": count_expired(today),
+        "bands": {str(b): int((df["days_left"] <= b).sum()) for b in URGENCY_BANDS if b <= days},
+        "items": json.loads(df.assign(expiry_date=df["expiry_date"].astype(str)).to_json(orient="records")),
+    }
+
+def _format_digest(digest):
+    lines = [f"Expiry digest for {digest['date']}",
+             f"{len(digest['items'])} item(s) expire within {digest['window_days']} days; {digest['expired']} already expired.", ""]
+    for item in digest["items"]:
+        lines.append(f"- [{item['days_left']:>3}d] {str(item['expiry_date'])[:10]}  {item['item_name']}"
+                     f" ({item.get('reference_no') or '-'}, {item.get('department') or '-'})")
+    return "\n".join(lines) + "\n"
+
+def write_digest(today=None, force=False):
+    """Writes today's digest to alert_outbox/digest-YYYY-MM-DD.json (+ a .txt for mailing to admins)
+    once per day. Later calls read the file back instead of querying assets again."""
+    today = today or date.today()
+    path = _digest_path(today)
+    if not force and os.path.exists(path): return load_digest(today)
+    digest = build_digest(today)
+    if digest is None: return None  # database unreachable; don't persist an empty digest for the day
+    os.makedirs(OUTBOX_DIR, exist_ok=True)
+    for ext, body in (("json", json.dumps(digest, indent=2)), ("txt", _format_digest(digest))):
+        tmp = _digest_path(today, ext) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f: f.write(body)
+        os.replace(tmp, _digest_path(today, ext))  # atomic, so readers never see half a file
+    return digest
+
+def load_digest(today=None):
+    try:
+        with open(_digest_path(today or date.today()), encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+def get_daily_digest(force=False):
+    """Today's digest. It is rebuilt, and its outbox file rewritten, after any assets write and
+    at least every DIGEST_TTL, so it never lags the table for long. If the database is unreachable
+    the file written earlier today is served instead."""
+    if force: invalidate("alert_digest")
+    def load():
+        digest = write_digest(force=True)
+        if digest is None: raise ConnectionError("expiry query failed")  # raise so the miss isn't cached
+        return digest
+    try: return cached(("assets", "alert_digest"), ("digest", str(date.today())), load, ttl=DIGEST_TTL)
+    except ConnectionError: return load_digest()
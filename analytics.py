@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from cache import cached
+from database import get_repository
+
+# --- ⚙️ CONFIGURATION ---
+CHUNK_ROWS = 20000          # log rows fetched (and held in memory) at a time
+LIVE_TTL = 60               # seconds; windows that include today keep changing
+HISTORY_TTL = 24 * 3600     # closed windows only change when logs are archived
+BURST_WINDOW = "10min"      # login bursts are counted in fixed buckets of this size
+BURST_LOGINS = 5            # logins per user / IP per BURST_WINDOW that count as a burst
+SPIKE_Z = 3.0               # activity more than this many std devs above a user's window average
+SPIKE_MIN = 20              # ...and at least this many actions in the window
+
+# breakdown name -> columns grouped on (besides the time window)
+BREAKDOWNS = {
+    "user": ["user"],
+    "action": ["action"],
+    "ip": ["ip_address"],
+    "user_action": ["user", "action"],
+    "action_ip": ["action", "ip_address"],
+}
+FREQS = {"Hour": "h", "Day": "D"}
+
+# --- 📥 CHUNKED SOURCE ---
+
+def iter_log_chunks(start_d, end_d, chunk_rows=CHUNK_ROWS):
+    """Yields the logs in [start_d, end_d] as columnar DataFrame chunks (keyset pages on the
+    (timestamp, id) index), so only `chunk_rows` rows are ever held client-side."""
+    filters = [("gte", "timestamp", start_d), ("lt", "timestamp", end_d + timedelta(days=1))]
+    pages = get_repository().iter_pages("logs", page_size=chunk_rows, columns="id, user, action, ip_address, timestamp",
+                                        filters=filters, order_by=("timestamp", "id"))
+    for rows in pages:
+        df = pd.DataFrame(rows, columns=["id", "user", "action", "ip_address", "timestamp"]).drop(columns="id")
+        for col in ("user", "action", "ip_address"):
+            df[col] = df[col].fillna("").astype("category")
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+        yield df
+
+# --- 🧮 AGGREGATION ---
+
+def _merge(acc, part):
+    # Partial counts from each chunk are folded in immediately: memory tracks the number of groups, not rows
+    if acc is None: return part
+    return pd.concat([acc, part]).groupby(level=list(range(part.index.nlevels)), observed=True).sum()
+
+def aggregate_logs(chunks, freq="h"):
+    """Counts actions per time window for every breakdown in BREAKDOWNS, plus per-user and per-IP
+    login counts in BURST_WINDOW buckets. Returns ({breakdown: Series}, {"user"|"ip_address": Series}, rows)."""
+    counts, bursts, rows = {}, {}, 0
+    for df in chunks:
+        rows += len(df)
+        window = df["timestamp"].dt.floor(freq)
+        for name, cols in BREAKDOWNS.items():
+            part = df.groupby([window.rename("window"), *cols], observed=True).size()
+            counts[name] = _merge(counts.get(name), part)
+        logins = df[df["action"] == "Login"]
+        burst_window = logins["timestamp"].dt.floor(BURST_WINDOW).rename("window")
+        for col in ("user", "ip_address"):
+            bursts[col] = _merge(bursts.get(col), logins.groupby([burst_window, col], observed=True).size())
+    return counts, bursts, rows
+
+def find_anomalies(counts, bursts):
+    """Flags login bursts (per user and per IP) and per-user activity spikes (z-score over that user's windows)."""
+    flags = []
+    for col, label in (("user", "Login burst (user)"), ("ip_address", "Login burst (IP)")):
+        s = bursts.get(col)
+        if s is None or s.empty: continue
+        for (window, key), n in s[s >= BURST_LOGINS].items():
+            if key: flags.append({"flag": label, "key": key, "window": window, "count": int(n)})
+    per_user = counts.get("user")
+    if per_user is not None and not per_user.empty:
+        values = per_user.to_numpy(dtype=float)
+        users = per_user.index.get_level_values("user")
+        grouped = per_user.groupby(level="user", observed=True)
+        mean = grouped.transform("mean").to_numpy()
+        std = grouped.transform("std").fillna(0).to_numpy()
+        z = np.divide(values - mean, std, out=np.zeros_like(values), where=std > 0)
+        for i in np.flatnonzero((z > SPIKE_Z) & (values >= SPIKE_MIN)):
+            flags.append({"flag": f"Activity spike (z={z[i]:.1f})", "key": users[i],
+                          "window": per_user.index[i][0], "count": int(values[i])})
+    df = pd.DataFrame(flags, columns=["flag", "key", "window", "count"])
+    return df.sort_values(["window", "count"], ascending=[False, False], ignore_index=True)
+
+# --- 📊 PUBLIC API ---
+
+def get_log_analytics(start_d, end_d, freq="h"):
+    """{"rows", "counts": {breakdown: DataFrame}, "anomalies": DataFrame} for [start_d, end_d].
+    Cached per window; closed windows are kept until logs are archived. Query errors are raised,
+    not cached, so the next rerun tries again."""
+    def load():
+        counts, bursts, rows = aggregate_logs(iter_log_chunks(start_d, end_d), freq)
+        return {
+            "rows": rows,
+            "counts": {name: s.rename("count").reset_index() for name, s in counts.items()},
+            "anomalies": find_anomalies(counts, bursts),
+        }
+    live = end_d >= date.today()
+    tables = "logs" if live else "log_history"
+    return cached(tables, ("log_analytics", str(start_d), str(end_d), freq), load, ttl=LIVE_TTL if live else HISTORY_TTL)
+
+def top_series(counts, key_col, top=10):
+    """Pivots a long (window, key, count) frame into a window x key chart frame, keeping the `top` busiest keys."""
+    if counts.empty: return pd.DataFrame()
+    keys = counts.groupby(key_col, observed=True)["count"].sum().nlargest(top).index
+    sub = counts[counts[key_col].isin(keys)]
+    return sub.pivot_table(index="window", columns=key_col, values="count", aggfunc="sum", fill_value=0, observed=True)
@@ -1,87 +1,156 @@
 import streamlit as st
 import pandas as pd
+import os
 import time
-import bcrypt
 from datetime import datetime, timedelta
-from supabase import create_client
+from alerts import get_daily_digest
+from analytics import BREAKDOWNS, FREQS, get_log_analytics, top_series
+from cache import cached, invalidate, cache_stats
+from exports import FORMATS, available_formats, read_export, remove_export, write_export
+from importer import import_csv
+from logs import get_client_ip, log_action as audit_log
+from retention import archive_logs, archived_months, get_retention_days, query_archive
+from search import global_search, search_table
+from snapshots import ensure_snapshots, get_series
+from auth import change_user_password, create_user, login_user
+from passwords import hash_passwords, verify_stats
+from database import (add_asset, add_hardware, add_staff_member, assign_hardware, delete_rows, get_dashboard_stats,
+                      get_department_counts, get_hardware_status_counts, get_log_count, get_repository,
+                      update_asset, update_hardware, update_staff, update_user_role)
 
 # --- ⚙️ CONFIGURATION ---
 DB_PASS_COL = "password_hash" 
+PAGE_SIZE = 50
+MAX_REPLY_FEEDS = 20
+REFRESH_OPTIONS = {"Off": None, "10s": 10, "30s": 30, "60s": 60}
+# Views read other tables, so their cached pages must be dropped when those tables change
+VIEW_DEPENDENCIES = {"hardware_master_report": ("hardware", "staff")}
+MASTER_REPORT_COLUMNS = {
+    "employee_number": "Employee Number", "full_name": "Employee Name",
+    "doj": "DOJ", "department": "Department", "asset_code": "Asset Code",
+    "serial_no": "Laptop S/N", "model": "Laptop Model Number",
+    "capitalized_date": "Capitalized Date", "assigned_to_id": "assigned_to_id", "assigned_date": "assigned_date"
+}
 
 st.set_page_config(page_title="LS Cable - IMS", page_icon="📦", layout="wide")
 
-# --- 🔌 CONNECT TO SUPABASE ---
-@st.cache_resource
-def init_connection():
-    try:
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        return create_client(url, key)
-    except Exception as e:
-        st.error(f"❌ Secret Error: {e}")
-        return None
-
-supabase = init_connection()
+# --- 🔌 CONNECT (Supabase, Postgres or the offline SQLite stand-in, see database.get_repository) ---
+try:
+    repo = get_repository()
+except Exception as e:
+    st.error(f"❌ Secret Error: {e}")
+    st.stop()
 
 # --- 🛠 HELPER FUNCTIONS ---
-def hash_password(plain_text_password):
-    return bcrypt.hashpw(plain_text_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def check_password(plain_text_password, hashed_password):
-    try:
-        return bcrypt.checkpw(plain_text_password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except:
-        return False
-
 def log_action(user, action, target):
+    # Queued: the insert runs in batches on the audit writer thread (see logs.py)
     try:
-        data = {
-            "user": user,
-            "action": action,
-            "target": target,
-            "timestamp": pd.Timestamp.now().isoformat()
-        }
-        supabase.table("logs").insert(data).execute()
+        audit_log(user, action, target)
     except Exception as e:
         print(f"Log Error: {e}")
 
-def get_data(table_name):
-    try:
-        response = supabase.table(table_name).select("*").execute()
-        return pd.DataFrame(response.data)
-    except:
-        return pd.DataFrame()
+def get_page(table_name, after=None, order_by=("id",), desc=False, page_size=PAGE_SIZE, columns="*", filters=(), use_cache=True):
+    """Keyset pagination: returns (df, next_cursor) for the rows after `after`.
 
-def login_user(username, password):
+    `order_by` is one column or a (column, tiebreaker) pair such as ("created_at", "id");
+    the cursor is the tuple of those values from the last row of the previous page.
+    `filters` are (operator, column, value) tuples, e.g. ("eq", "status", "Open").
+    """
     try:
-        response = supabase.table("users").select("*").eq("username", username).execute()
-        if response.data:
-            user = response.data[0]
-            stored_pw = user.get(DB_PASS_COL)
-            if not stored_pw: return None
-
-            try:
-                if bcrypt.checkpw(password.encode('utf-8'), stored_pw.encode('utf-8')):
-                    return user['role']
-            except (ValueError, TypeError):
-                pass
-
-            if stored_pw == password:
-                new_hash = hash_password(password)
-                supabase.table("users").update({DB_PASS_COL: new_hash}).eq("username", username).execute()
-                return user['role']
-    except Exception as e:
-        print(f"Login Error: {e}")
-    return None
-
-def update_password(username, new_password):
+        key = ("page", table_name, after, tuple(order_by), desc, page_size, columns, tuple(filters))
+        load = lambda: repo.select(table_name, columns, filters, order_by, desc, after, limit=page_size + 1)
+        rows = cached(VIEW_DEPENDENCIES.get(table_name, table_name), key, load) if use_cache else load()
+        next_cursor = tuple(rows[page_size - 1][c] for c in order_by) if len(rows) > page_size else None
+        return pd.DataFrame(rows[:page_size]), next_cursor
+    except:
+        return pd.DataFrame(), None
+
+def iter_pages(table_name, page_size=1000, after=None, **kwargs):
+    """Walks a whole (filtered) table page by page without caching, for exports and jobs."""
+    for rows in repo.iter_pages(table_name, page_size=page_size, after=after, **kwargs):
+        yield pd.DataFrame(rows)
+
+def count_rows(table_name, filters=()):
+    """COUNT(*) evaluated by the database - no rows are transferred."""
+    def load():
+        return repo.count(table_name, filters)
+    try: return cached(table_name, ("count", table_name, tuple(filters)), load)
+    except: return 0
+
+def paged_data(table_name, key, **kwargs):
+    """Renders Prev/Next controls and returns only the current page of `table_name`.
+    Changing the filters starts again from the first page."""
+    filters = tuple(kwargs.get("filters", ()))
+    if st.session_state.get(f"pager_filters_{key}") != filters:
+        st.session_state[f"pager_filters_{key}"] = filters
+        st.session_state[f"pager_{key}"] = [None]
+    cursors = st.session_state.setdefault(f"pager_{key}", [None])
+    df, next_cursor = get_page(table_name, after=cursors[-1], **kwargs)
+    c_prev, c_info, c_next = st.columns([1, 4, 1])
+    # Callbacks instead of st.rerun() so a pager inside a fragment only reruns that fragment
+    c_prev.button("◀ Prev", key=f"prev_{key}", disabled=len(cursors) == 1, on_click=cursors.pop)
+    c_info.caption(f"Page {len(cursors)} · {len(df)} rows")
+    c_next.button("Next ▶", key=f"next_{key}", disabled=next_cursor is None, on_click=cursors.append, args=(next_cursor,))
+    return df
+
+def get_column(table_name, column):
     try:
-        hashed_pw = hash_password(new_password)
-        supabase.table("users").update({DB_PASS_COL: hashed_pw}).eq("username", username).execute()
-        log_action(st.session_state.get('username'), "Update Password", username)
-        return True
+        rows = cached(table_name, ("column", table_name, column), lambda: repo.select(table_name, column, order_by=(column,)))
+        return [r[column] for r in rows]
     except:
-        return False
+        return []
+
+def discard_export(state_key):
+    path = st.session_state.pop(state_key, {}).get("path")
+    if path: remove_export(path)
+
+def export_button(label, key, pages_fn, base_name, rename=None):
+    """Lazy export: nothing is fetched until the user asks. `pages_fn()` yields DataFrame chunks
+    (e.g. iter_pages) which exports.py streams to a temp file in the chosen format. The file is
+    only read when the download is clicked, then deleted; abandoned ones expire after EXPORT_TTL."""
+    state_key = f"export_{key}"
+    c_fmt, c_btn = st.columns([1, 2])
+    fmt = c_fmt.selectbox("Format", available_formats(), key=f"fmt_{key}", label_visibility="collapsed")
+    if c_btn.button(label, key=f"prep_{key}", use_container_width=True):
+        discard_export(state_key)
+        with st.spinner("Preparing export..."):
+            path = write_export(pages_fn(), fmt, rename)
+        if path: st.session_state[state_key] = {"path": path, "fmt": fmt}
+        else: st.info("Nothing to export.")
+    export = st.session_state.get(state_key)
+    if export and not os.path.exists(export["path"]):
+        st.session_state.pop(state_key)  # downloaded, or expired and swept
+    elif export:
+        ext, mime = FORMATS[export["fmt"]]
+        path = export["path"]
+        st.download_button(f"💾 Save {base_name}.{ext}", lambda: read_export(path), f"{base_name}.{ext}", mime,
+                           key=f"dl_{key}", use_container_width=True, on_click=st.session_state.pop, args=(state_key, None))
+
+def run_bulk_import(table, up_file, prepare=None):
+    """Streams an uploaded CSV into `table` and shows the import summary + error report."""
+    bar = st.progress(0.0, text="Importing...")
+    size = getattr(up_file, "size", 0) or 1
+    def progress(inserted, rejected):
+        bar.progress(min(up_file.tell() / size, 1.0), text=f"Inserted {inserted} · Rejected {rejected}")
+    report = import_csv(up_file, table, lambda batch: repo.insert(table, batch), prepare, progress)
+    invalidate(table)
+    summary = f"{table}: {report['inserted']} inserted, {report['rejected']} rejected"
+    if report["aborted"]: summary += f", {report['not_attempted']} not attempted"
+    log_action(st.session_state.get('username'), "Bulk Upload", summary)
+    if report["aborted"]:
+        st.error(f"Import stopped, the database failed: {report['aborted']}. {report['not_attempted']} rows were not attempted.")
+    if report["inserted"]: st.success(f"Inserted {report['inserted']} rows.")
+    if report["ignored_columns"]: st.info(f"Ignored unknown columns: {', '.join(report['ignored_columns'])}")
+    if report["rejected"]:
+        st.warning(f"Rejected {report['rejected']} rows.")
+        st.dataframe(report["errors"].head(100), hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Error Report", report["errors"].to_csv(index=False).encode('utf-8'), f"{table}_import_errors.csv")
+    return report
+
+def hash_user_passwords(batch, on_progress=None):
+    hashes = hash_passwords([rec.pop("password") for rec in batch], on_progress)
+    for rec, pw_hash in zip(batch, hashes): rec[DB_PASS_COL] = pw_hash
+    return batch
 
 # --- ⏳ SESSION STATE ---
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
@@ -95,12 +164,18 @@ if 'selected_ticket' not in st.session_state: st.session_state['selected_ticket'
 def confirm_delete(table, id_list):
     st.write(f"Are you sure you want to delete {len(id_list)} items?")
     if st.button("Confirm Delete", type="primary"):
-        for item_id in id_list:
-            supabase.table(table).delete().eq("id", item_id).execute()
-        log_action(st.session_state.get('username'), "Bulk Delete", table)
-        st.success("Deleted!")
-        time.sleep(1)
-        st.rerun()
+        bar = st.progress(0.0, text="Deleting...")
+        results = delete_rows(table, id_list, st.session_state.get('username'), get_client_ip(),
+                              on_progress=lambda done, total: bar.progress(done / total, text=f"Deleted {done}/{total}"))
+        deleted = [i for r in results for i in r["deleted"]]
+        failed = [r for r in results if r["error"]]
+        if failed:
+            st.error(f"Deleted {len(deleted)} of {len(id_list)}. {len(failed)} chunk(s) failed:")
+            for r in failed: st.caption(f"ids {r['ids'][0]}…{r['ids'][-1]}: {r['error']}")
+        else:
+            st.success(f"Deleted {len(deleted)} items!")
+            time.sleep(1)
+            st.rerun()
 
 @st.dialog("Submit Support Ticket")
 def create_ticket_form():
@@ -111,10 +186,11 @@ def create_ticket_form():
             if subject and message:
                 try:
                     data = {"subject": subject, "initial_message": message, "created_by": st.session_state['username'], "status": "Open", "created_at": pd.Timestamp.now().isoformat()}
-                    res = supabase.table("tickets").insert(data).execute()
-                    if res.data:
-                        tid = res.data[0]['id']
-                        supabase.table("ticket_replies").insert({"ticket_id": tid, "sender": st.session_state['username'], "message": message}).execute()
+                    created = repo.insert("tickets", [data])
+                    if created:
+                        tid = created[0]['id']
+                        repo.insert("ticket_replies", [{"ticket_id": tid, "sender": st.session_state['username'], "message": message}])
+                    invalidate("tickets", "ticket_replies")
                     st.success("Ticket Created!")
                     st.rerun()
                 except Exception as e: st.error(f"Error: {e}")
@@ -145,15 +221,10 @@ def edit_hardware_dialog(item):
         stat = c2.selectbox("Status", status_opts, index=idx)
         
         if st.form_submit_button("Update Hardware"):
-            update_data = {
-                "item_name": name, "serial_no": serial, "model": model, 
-                "asset_code": asset_code, "status": stat
-            }
-            if cap_date: update_data["capitalized_date"] = str(cap_date)
-            
-            supabase.table("hardware").update(update_data).eq("id", item["id"]).execute()
-            st.success("Updated Successfully!")
-            st.rerun()
+            if update_hardware(item["id"], name, serial, model, asset_code, stat, str(cap_date) if cap_date else None):
+                st.success("Updated Successfully!")
+                st.rerun()
+            else: st.error("Update failed.")
 
 @st.dialog("✏️ Edit Subscription")
 def edit_asset_dialog(item):
@@ -180,14 +251,10 @@ def edit_asset_dialog(item):
         sup = c2.text_input("Supplier", value=item.get("supplier", ""))
         
         if st.form_submit_button("Update Subscription"):
-            update_data = {
-                "item_name": item_name, "reference_no": ref, "category": cat,
-                "department": dept, "supplier": sup
-            }
-            if exp: update_data["expiry_date"] = str(exp)
-            supabase.table("assets").update(update_data).eq("id", item["id"]).execute()
-            st.success("Updated!")
-            st.rerun()
+            if update_asset(item["id"], item_name, ref, str(exp) if exp else None, cat, dept, sup):
+                st.success("Updated!")
+                st.rerun()
+            else: st.error("Update failed.")
 
 @st.dialog("✏️ Edit Staff")
 def edit_staff_dialog(item):
@@ -205,11 +272,10 @@ def edit_staff_dialog(item):
         doj = st.date_input("Date of Joining", value=d_val)
         
         if st.form_submit_button("Update Staff"):
-            update_data = {"full_name": name, "email": email, "department": dept, "employee_number": emp_no}
-            if doj: update_data["doj"] = str(doj)
-            supabase.table("staff").update(update_data).eq("id", item["id"]).execute()
-            st.success("Updated!")
-            st.rerun()
+            if update_staff(item["id"], name, email, dept, emp_no, str(doj) if doj else None):
+                st.success("Updated!")
+                st.rerun()
+            else: st.error("Update failed.")
 
 @st.dialog("✏️ Edit User Role")
 def edit_user_dialog(item):
@@ -221,9 +287,10 @@ def edit_user_dialog(item):
         new_role = st.selectbox("Role", roles, index=idx)
         
         if st.form_submit_button("Update Role"):
-            supabase.table("users").update({"role": new_role}).eq("id", item["id"]).execute()
-            st.success("Role Updated!")
-            st.rerun()
+            if update_user_role(item["id"], new_role):
+                st.success("Role Updated!")
+                st.rerun()
+            else: st.error("Update failed.")
 
 # --- UI COMPONENTS ---
 def login_page():
@@ -244,31 +311,50 @@ def login_page():
             else:
                 st.error("Invalid credentials")
 
-def render_ticket_row(t):
+def select_ticket(ticket):
+    st.session_state['selected_ticket'] = ticket
+
+def render_ticket_list(df_tickets, key):
+    """Virtualised grid: one st.dataframe instead of a row of widgets per ticket.
+    Selecting a row opens the ticket by rerunning only the support fragment."""
+    cols = [c for c in ["id", "status", "subject", "created_by", "created_at"] if c in df_tickets.columns]
+    event = st.dataframe(df_tickets[cols], hide_index=True, use_container_width=True, key=key,
+                         on_select="rerun", selection_mode="single-row",
+                         column_config={"id": "#", "created_at": "Created"})
+    if event.selection.rows:
+        select_ticket(df_tickets.iloc[event.selection.rows[0]].to_dict())
+        st.rerun(scope="fragment")
+
+def fetch_new_replies(t_id):
+    """Replies are append-only, so each ticket keeps its rows plus a (created_at, id) cursor
+    in session state and only asks for rows past that cursor."""
+    feeds = st.session_state.setdefault('reply_feeds', {})
+    feed = feeds.pop(t_id, None) or {"rows": [], "cursor": None}
+    feeds[t_id] = feed  # re-insert so the most recently viewed tickets are kept
+    while len(feeds) > MAX_REPLY_FEEDS: feeds.pop(next(iter(feeds)))
     try:
-        with st.container():
-            col_id, col_stat, col_sub, col_user, col_act = st.columns([0.5, 1, 3, 1.5, 1])
-            t_id = t.get('id', '??')
-            t_status = t.get('status', 'Open')
-            t_subj = t.get('subject', 'No Subject')
-            t_creator = t.get('created_by', 'Unknown')
-            t_date = str(t.get('created_at', ''))[:10]
-            col_id.write(f"**#{t_id}**")
-            color = "green" if t_status == 'Open' else "grey" if t_status == 'Closed' else "orange"
-            col_stat.markdown(f":{color}[{t_status}]")
-            col_sub.write(t_subj)
-            col_user.caption(f"{t_creator}\n{t_date}")
-            if col_act.button("View", key=f"btn_{t_id}"):
-                st.session_state['selected_ticket'] = t
-                st.rerun()
-            st.divider()
-    except Exception as e:
-        st.error(f"Row Error: {e}")
+        for df in iter_pages("ticket_replies", page_size=200, after=feed["cursor"], order_by=("created_at", "id"),
+                             filters=[("eq", "ticket_id", t_id)]):
+            new_rows = df.to_dict("records")
+            feed["rows"].extend(new_rows)
+            feed["cursor"] = (new_rows[-1]["created_at"], new_rows[-1]["id"])
+    except Exception as e: print(f"Reply Fetch Error: {e}")
+    return feed["rows"]
+
+def render_reply_feed(t_id, is_admin):
+    chat_container = st.container(height=400)
+    with chat_container:
+        for r in fetch_new_replies(t_id):
+            sender = r.get('sender', 'Unknown')
+            msg = r.get('message', '')
+            is_me = sender == st.session_state['username']
+            role_icon = "🛠️" if "admin" in sender or (is_admin and is_me) else "👤"
+            with st.chat_message(sender, avatar=role_icon):
+                st.write(msg)
+                st.caption(str(r.get('created_at', '')))
 
 def render_ticket_detail(ticket, is_admin):
-    if st.button("← Back to List"):
-        st.session_state['selected_ticket'] = None
-        st.rerun()
+    st.button("← Back to List", on_click=select_ticket, args=(None,))
     t_subj = ticket.get('subject', 'No Subject')
     t_id = ticket.get('id', '?')
     t_creator = ticket.get('created_by', 'Unknown')
@@ -277,22 +363,11 @@ def render_ticket_detail(ticket, is_admin):
     st.markdown(f"### {t_subj} <span style='color:grey; font-size:0.8em'>#{t_id}</span>", unsafe_allow_html=True)
     st.caption(f"Created by **{t_creator}** on {t_date}")
     st.write(f"**Status:** {t_status}")
+    _, c_refresh = st.columns([3, 1])
+    refresh = c_refresh.selectbox("Auto-refresh", list(REFRESH_OPTIONS), key="reply_refresh")
     st.divider()
-    replies = []
-    try:
-        r_res = supabase.table("ticket_replies").select("*").eq("ticket_id", t_id).order("created_at", desc=False).execute()
-        replies = r_res.data
-    except: pass
-    chat_container = st.container(height=400)
-    with chat_container:
-        for r in replies:
-            sender = r.get('sender', 'Unknown')
-            msg = r.get('message', '')
-            is_me = sender == st.session_state['username']
-            role_icon = "🛠️" if "admin" in sender or (is_admin and is_me) else "👤"
-            with st.chat_message(sender, avatar=role_icon):
-                st.write(msg)
-                st.caption(str(r.get('created_at', '')))
+    # Nested fragment: polling only re-renders the chat box, not the reply form
+    st.fragment(render_reply_feed, run_every=REFRESH_OPTIONS[refresh])(t_id, is_admin)
     with st.form("reply_form"):
         st.write("Reply")
         new_msg = st.text_area("Message", height=100, label_visibility="collapsed")
@@ -305,61 +380,63 @@ def render_ticket_detail(ticket, is_admin):
             new_status = c_stat.selectbox("Update Status", opts, index=idx)
         if st.form_submit_button("Send Reply"):
             if new_msg:
-                supabase.table("ticket_replies").insert({
+                repo.insert("ticket_replies", [{
                     "ticket_id": t_id, "sender": st.session_state['username'], "message": new_msg
-                }).execute()
+                }])
+                invalidate("ticket_replies")
                 if is_admin and new_status != t_status:
-                    supabase.table("tickets").update({"status": new_status}).eq("id", t_id).execute()
+                    repo.update("tickets", {"status": new_status}, [("eq", "id", t_id)])
+                    invalidate("tickets")
                     st.session_state['selected_ticket']['status'] = new_status
                 st.success("Sent!")
-                st.rerun()
+                st.rerun(scope="fragment")
 
 # --- SUPPORT MODULE ---
 def support_module():
     st.title("📢 Support Portal")
-    is_admin = st.session_state['role'] == 'admin'
+    support_region(st.session_state['role'] == 'admin')
+
+@st.fragment
+def support_region(is_admin):
+    # Filters, paging, opening and replying to tickets only rerun this region
     if st.session_state['selected_ticket'] is not None:
         render_ticket_detail(st.session_state['selected_ticket'], is_admin)
     else:
         if is_admin:
             st.subheader("🛠️ Admin Support Dashboard")
-            c_date, c_btn = st.columns([3, 1])
+            c_date, c_stat, c_user, c_btn = st.columns([2, 1, 1, 1])
             with c_date:
                 default_start = datetime.now() - timedelta(days=30)
                 date_range = st.date_input("Filter by Date", value=(default_start, datetime.now()))
+            status_f = c_stat.selectbox("Status", ["All", "Open", "In Progress", "Closed"])
+            creator_f = c_user.text_input("Created By")
             with c_btn:
                 if st.button("➕ Create Ticket"): create_ticket_form()
             try:
-                response = supabase.table("tickets").select("*").order("created_at", desc=True).execute()
-                df_tickets = pd.DataFrame(response.data)
-                if not df_tickets.empty:
-                    if len(date_range) == 2:
-                        start_d, end_d = date_range
-                        if 'created_at' in df_tickets.columns:
-                            df_tickets['created_at'] = pd.to_datetime(df_tickets['created_at'], errors='coerce')
-                            df_tickets = df_tickets.dropna(subset=['created_at'])
-                            mask = (df_tickets['created_at'].dt.date >= start_d) & (df_tickets['created_at'].dt.date <= end_d)
-                            df_filtered = df_tickets[mask]
-                        else: df_filtered = df_tickets
-                    else: df_filtered = df_tickets
-                    m1, m2, m3 = st.columns(3)
-                    m1.metric("Total Tickets", len(df_filtered))
-                    m2.metric("Open Tickets", len(df_filtered[df_filtered['status'] == 'Open']) if 'status' in df_filtered.columns else 0)
-                    m3.download_button("⬇️ Download Report", df_filtered.to_csv(index=False).encode('utf-8'), "support_report.csv")
-                    st.divider()
-                    st.write("### Ticket History")
-                    for idx, t in df_filtered.iterrows(): render_ticket_row(t)
-                else: st.info("No tickets found in database.")
+                filters = []
+                if len(date_range) == 2:
+                    filters.append(("gte", "created_at", str(date_range[0])))
+                    filters.append(("lt", "created_at", str(date_range[1] + timedelta(days=1))))
+                if status_f != "All": filters.append(("eq", "status", status_f))
+                if creator_f: filters.append(("eq", "created_by", creator_f.strip()))
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Total Tickets", count_rows("tickets", filters))
+                m2.metric("Open Tickets", count_rows("tickets", [f for f in filters if f[1] != "status"] + [("eq", "status", "Open")]) if status_f in ("All", "Open") else 0)
+                with m3: export_button("⬇️ Download Report", "support", lambda: iter_pages("tickets", filters=filters, order_by=("created_at", "id"), desc=True), "support_report")
+                st.divider()
+                st.write("### Ticket History")
+                df_page = paged_data("tickets", "tickets_admin", order_by=("created_at", "id"), desc=True, filters=filters)
+                if not df_page.empty: render_ticket_list(df_page, "ticket_grid_admin")
+                else: st.info("No tickets match these filters.")
             except Exception as e: st.error(f"Error Loading Admin Tickets: {e}")
         else:
             c1, c2 = st.columns([3, 1])
             c1.subheader("Your Tickets")
             if c2.button("➕ Create New Ticket"): create_ticket_form()
             try:
-                response = supabase.table("tickets").select("*").eq("created_by", st.session_state['username']).order("created_at", desc=True).execute()
-                df_tickets = pd.DataFrame(response.data)
-                if not df_tickets.empty:
-                    for idx, t in df_tickets.iterrows(): render_ticket_row(t)
+                me_filter = [("eq", "created_by", st.session_state['username'])]
+                df_tickets = paged_data("tickets", "tickets_mine", order_by=("created_at", "id"), desc=True, filters=me_filter)
+                if not df_tickets.empty: render_ticket_list(df_tickets, "ticket_grid_mine")
                 else: st.info("You haven't created any tickets yet.")
             except Exception as e: st.error(f"Error Loading User Tickets: {e}")
 
@@ -374,6 +451,12 @@ def main_app():
     else:
         menu = st.sidebar.radio("Menu", ["Support"])
         
+    if role == 'admin':
+        c_stats = cache_stats()
+        st.sidebar.caption(f"⚡ Cache: {c_stats['hits']} hits / {c_stats['misses']} misses ({c_stats['hit_rate']:.0%})")
+        for scheme, m in verify_stats().items():
+            st.sidebar.caption(f"🔐 {scheme} verify: avg {m['avg_ms']:.0f} ms · max {m['max_ms']:.0f} ms ({m['count']})")
+
     if st.sidebar.button("Logout"):
         st.session_state.clear()
         st.rerun()
@@ -388,35 +471,60 @@ def main_app():
             default_start = datetime.now() - timedelta(days=30)
             date_range = st.date_input("📅 Date Range", value=(default_start, datetime.now()))
 
-        # Load Data
-        df_assets = get_data("assets")
-        df_hw = get_data("hardware")
-        df_logs = get_data("logs")
-        
-        # Apply Date Filters
+        # Global Search (assets, hardware, staff and tickets queried concurrently)
+        g_query = st.text_input("🔎 Global Search", placeholder="Serial number, asset, person, ticket...")
+        if g_query:
+            hits, timed_out = global_search(repo, g_query)
+            if hits:
+                st.dataframe(pd.DataFrame(hits), hide_index=True, use_container_width=True,
+                             column_config={"entity": "Type", "score": st.column_config.ProgressColumn("Relevance", min_value=0, max_value=2)})
+            else: st.info("No matches.")
+            if timed_out: st.caption(f"⏱️ Skipped (over latency budget): {', '.join(timed_out)}")
+            st.divider()
+
+        # Load Stats (aggregated in the database, no full-table fetch)
+        stats = get_dashboard_stats()
+        hw_status = get_hardware_status_counts()
+        dept_counts = get_department_counts()
         if len(date_range) == 2:
             start_d, end_d = date_range
-            if not df_logs.empty and 'timestamp' in df_logs.columns:
-                df_logs['timestamp'] = pd.to_datetime(df_logs['timestamp']).dt.tz_localize(None)
-                df_logs = df_logs[(df_logs['timestamp'].dt.date >= start_d) & (df_logs['timestamp'].dt.date <= end_d)]
-            if not df_hw.empty and 'created_at' in df_hw.columns:
-                df_hw['created_at'] = pd.to_datetime(df_hw['created_at']).dt.tz_localize(None)
-                # Keep original hardware data for total count, but maybe filter for charts
-                pass 
+            log_count = get_log_count(start_d, end_d)
+        else:
+            start_d = end_d = None
+            log_count = get_log_count()
+
+        digest = get_daily_digest() or {"window_days": 0, "expired": 0, "bands": {}, "items": []}
 
         # Metric Cards
         st.markdown("### Overview")
-        m1, m2, m3 = st.columns(3)
+        m1, m2, m3, m4 = st.columns(4)
         with m1:
             with st.container(border=True):
-                st.metric("📦 Subscriptions", len(df_assets))
+                st.metric("📦 Subscriptions", stats.get("sub_total", 0))
         with m2:
             with st.container(border=True):
-                st.metric("💻 Hardware", len(df_hw))
+                st.metric("💻 Hardware", stats.get("hw_total", 0))
         with m3:
             with st.container(border=True):
-                st.metric("📜 Logs", len(df_logs))
-        
+                st.metric("📜 Logs", log_count)
+        with m4:
+            with st.container(border=True):
+                st.metric(f"⏰ Expiring ({digest['window_days']}d)", len(digest["items"]),
+                          delta=f"{digest['expired']} expired", delta_color="inverse" if digest["expired"] else "off",
+                          help=f"Digest generated {digest.get('generated_at') or digest.get('date', 'never')}")
+
+        # Smart Alerts (today's digest from alert_outbox/, no table scan)
+        if digest["items"]:
+            bands = " · ".join(f"{n} within {b}d" for b, n in digest["bands"].items())
+            with st.expander(f"🔔 {len(digest['items'])} subscription(s) expiring soon — {bands}", expanded=digest["bands"].get("7", 0) > 0):
+                st.dataframe(pd.DataFrame(digest["items"]).drop(columns=["id"]), hide_index=True, use_container_width=True,
+                             column_config={"days_left": st.column_config.NumberColumn("Days Left", format="%d d")})
+                st.caption(f"Digest generated for {digest['date']}")
+        # Picks up asset writes made by other app processes since the digest was built
+        if st.button("🔄 Regenerate Digest"):
+            get_daily_digest(force=True)
+            st.rerun()
+
         st.divider()
 
         # Charts and Reports
@@ -424,30 +532,41 @@ def main_app():
         
         with c_charts:
             st.subheader("📈 Analytics")
-            tab1, tab2 = st.tabs(["Hardware Status", "Assets by Department"])
+            tab1, tab2, tab3 = st.tabs(["Hardware Status", "Assets by Department", "Trends"])
             with tab1:
-                if not df_hw.empty:
-                    # Simple bar chart of status
-                    st.bar_chart(df_hw['status'].value_counts())
+                if hw_status:
+                    st.bar_chart(pd.Series(hw_status, name="count"))
                 else:
                     st.info("No data available")
             with tab2:
-                if not df_assets.empty:
-                    # Simple bar chart of departments
-                    st.bar_chart(df_assets['department'].value_counts())
+                if dept_counts:
+                    st.bar_chart(pd.Series(dept_counts, name="count"))
                 else:
                     st.info("No data available")
+            with tab3:
+                # Pre-aggregated daily series (snapshots.py), so the date range costs a few hundred rows at most
+                if start_d:
+                    ensure_snapshots()
+                    trend = st.selectbox("Series", ["Logins per day", "Actions per day", "Hardware by status", "Assets by department"], label_visibility="collapsed")
+                    metric = {"Logins per day": "logins", "Actions per day": "actions",
+                              "Hardware by status": "hardware_by_status", "Assets by department": "assets_by_department"}[trend]
+                    series = get_series(metric, start_d, end_d)
+                    if series.empty: st.info("No snapshots in this range yet")
+                    elif metric == "actions": st.bar_chart(series, stack=True)
+                    else: st.line_chart(series)
+                else:
+                    st.info("Pick a start and end date to see trends")
 
         with c_reports:
             st.subheader("📥 Quick Reports")
             with st.container(border=True):
                 st.write("Export your data:")
-                if not df_hw.empty: 
-                    st.download_button("⬇️ Hardware CSV", df_hw.to_csv(index=False).encode('utf-8'), "hw_report.csv", use_container_width=True)
-                if not df_assets.empty: 
-                    st.download_button("⬇️ Software CSV", df_assets.to_csv(index=False).encode('utf-8'), "sw_report.csv", use_container_width=True)
-                if not df_logs.empty: 
-                    st.download_button("⬇️ Logs CSV", df_logs.to_csv(index=False).encode('utf-8'), "logs_filtered.csv", use_container_width=True)
+                export_button("⬇️ Hardware", "hw", lambda: iter_pages("hardware"), "hw_report")
+                export_button("⬇️ Software", "sw", lambda: iter_pages("assets"), "sw_report")
+                log_filters = []
+                if start_d:
+                    log_filters = [("gte", "timestamp", str(start_d)), ("lt", "timestamp", str(end_d + timedelta(days=1)))]
+                export_button("⬇️ Logs", "logs", lambda: iter_pages("logs", order_by=("timestamp", "id"), filters=log_filters), "logs_filtered")
 
     elif menu == "Support":
         support_module()
@@ -455,20 +574,17 @@ def main_app():
     # --- SUBSCRIPTIONS (POPUP EDIT) ---
     elif menu == "Subscriptions" and role == 'admin':
         st.title("📄 Subscriptions")
-        df = get_data("assets")
         tab1, tab2 = st.tabs(["View / Search / Edit", "Add & Upload"])
         
         with tab1:
+            search = st.text_input("Search Assets", placeholder="Name, reference, supplier... (prefix matches rank first)")
+            df = search_table(repo, "assets", search) if search else paged_data("assets", "assets")
             if not df.empty:
-                search = st.text_input("Search Assets")
-                if search:
-                    df = df[df.astype(str).apply(lambda x: x.str.contains(search, case=False)).any(axis=1)]
-                
                 # Checkbox selection for edit
                 if "Select" not in df.columns: df.insert(0, "Select", False)
                 
                 # Show Data Editor (Read only mostly, but allow checkbox)
-                edited = st.data_editor(df, hide_index=True, disabled=["id", "created_at", "item_name", "reference_no", "expiry_date", "category", "department", "supplier"])
+                edited = st.data_editor(df, hide_index=True, disabled=["_score", "id", "created_at", "item_name", "reference_no", "expiry_date", "category", "department", "supplier"])
                 
                 c_edit, c_del = st.columns([1, 4])
                 
@@ -505,10 +621,10 @@ def main_app():
                 dept = c1.selectbox("Department", ["IT", "HR", "Sales"])
                 sup = c2.text_input("Supplier")
                 if st.form_submit_button("Save"):
-                    data = {"item_name": item, "reference_no": ref, "expiry_date": str(exp), "category": cat, "department": dept, "supplier": sup}
-                    supabase.table("assets").insert(data).execute()
-                    st.success("Saved!")
-                    st.rerun()
+                    if add_asset(item, ref, str(exp), cat, dept, sup):
+                        st.success("Saved!")
+                        st.rerun()
+                    else: st.error("Save failed.")
             st.divider()
             st.subheader("📂 Bulk Upload")
             c_dl, c_up = st.columns([1, 2])
@@ -518,13 +634,7 @@ def main_app():
             with c_up:
                 up_file = st.file_uploader("Upload CSV", type=['csv'], key='sub_csv')
                 if up_file and st.button("Process Bulk"):
-                    try:
-                        data = pd.read_csv(up_file)
-                        records = data.to_dict('records')
-                        for r in records: r['expiry_date'] = str(r['expiry_date'])
-                        supabase.table("assets").insert(records).execute()
-                        st.success("Uploaded!")
-                        st.rerun()
+                    try: run_bulk_import("assets", up_file)
                     except Exception as e: st.error(f"Error: {e}")
 
     # --- HARDWARE (POPUP EDIT) ---
@@ -535,39 +645,26 @@ def main_app():
         # TAB 1: MASTER REPORT
         with tab_report:
             st.subheader("📋 Hardware Master Report")
+            # Joined and projected in Postgres by the hardware_master_report view (see fix_db.py)
             try:
-                hw_data = supabase.table("hardware").select("*").execute().data
-                staff_data = supabase.table("staff").select("*").execute().data
-                if hw_data:
-                    df_hw = pd.DataFrame(hw_data)
-                    df_staff = pd.DataFrame(staff_data) if staff_data else pd.DataFrame()
-                    if 'assigned_to_id' in df_hw.columns and not df_staff.empty:
-                        merged_df = pd.merge(df_hw, df_staff, left_on='assigned_to_id', right_on='id', how='left', suffixes=('_hw', '_staff'))
-                    else: merged_df = df_hw
-                    
-                    column_mapping = {
-                        "employee_number": "Employee Number", "full_name": "Employee Name",
-                        "doj": "DOJ", "department": "Department", "asset_code": "Asset Code",
-                        "serial_no": "Laptop S/N", "model": "Laptop Model Number",
-                        "capitalized_date": "Capitalized Date", "assigned_to_id": "assigned_to_id", "assigned_date": "assigned_date"
-                    }
-                    final_df = pd.DataFrame()
-                    for db_col, report_col in column_mapping.items():
-                        if db_col in merged_df.columns: final_df[report_col] = merged_df[db_col]
-                        else: final_df[report_col] = None 
-                    st.dataframe(final_df, use_container_width=True)
-                    st.download_button("⬇️ Download Report", final_df.to_csv(index=False).encode('utf-8'), "Master_Asset_Report.csv", "text/csv")
+                df_page = paged_data("hardware_master_report", "master_report", columns=",".join(["id"] + list(MASTER_REPORT_COLUMNS)))
+                if not df_page.empty:
+                    report_df = df_page.reindex(columns=list(MASTER_REPORT_COLUMNS)).rename(columns=MASTER_REPORT_COLUMNS)
+                    st.dataframe(report_df, use_container_width=True, hide_index=True)
+                    export_button("⬇️ Download Report", "master_report", lambda: iter_pages("hardware_master_report"),
+                                  "Master_Asset_Report", rename=MASTER_REPORT_COLUMNS)
                 else: st.info("No hardware found.")
             except Exception as e: st.error(f"Error generating report: {e}")
 
         # TAB 2: INVENTORY (POPUP EDIT)
         with tab_inv:
             st.subheader("🛠️ Manage Inventory")
-            df = get_data("hardware")
+            hw_search = st.text_input("Search Hardware", placeholder="Serial no, asset code, model...", key="hw_search")
+            df = search_table(repo, "hardware", hw_search) if hw_search else paged_data("hardware", "hardware")
             if not df.empty:
                 if "Select" not in df.columns: df.insert(0, "Select", False)
                 # Show columns but disable editing directly
-                edited_df = st.data_editor(df, hide_index=True, use_container_width=True, disabled=["id", "created_at", "item_name", "serial_no", "model", "status", "asset_code", "capitalized_date"])
+                edited_df = st.data_editor(df, hide_index=True, use_container_width=True, disabled=["_score", "id", "created_at", "item_name", "serial_no", "model", "status", "asset_code", "capitalized_date"])
                 
                 c_edit, c_del = st.columns([1, 4])
                 
@@ -598,10 +695,10 @@ def main_app():
                 cap_date = c1.date_input("Capitalized Date")
                 stat = c2.selectbox("Status", ["Available", "Assigned", "Broken"])
                 if st.form_submit_button("Add Hardware"):
-                    data = {"item_name": name, "serial_no": serial, "model": model, "status": stat, "asset_code": asset_code, "capitalized_date": str(cap_date)}
-                    supabase.table("hardware").insert(data).execute()
-                    st.success("Added!")
-                    st.rerun()
+                    if add_hardware(name, serial, model, stat, asset_code, str(cap_date)):
+                        st.success("Added!")
+                        st.rerun()
+                    else: st.error("Save failed.")
             st.divider()
             st.subheader("📂 Bulk Upload")
             c_dl, c_up = st.columns([1, 2])
@@ -611,50 +708,60 @@ def main_app():
             with c_up:
                 up_file = st.file_uploader("Upload CSV", type=['csv'], key='hw_csv')
                 if up_file and st.button("Process Bulk"):
-                    try:
-                        data = pd.read_csv(up_file)
-                        records = data.to_dict('records')
-                        supabase.table("hardware").insert(records).execute()
-                        st.success("Uploaded!")
-                        st.rerun()
+                    try: run_bulk_import("hardware", up_file)
                     except Exception as e: st.error(f"Error: {e}")
 
         # TAB 4: ASSIGN
         with tab_assign:
             st.subheader("🔗 Assign Hardware to Staff")
+            for level, msg in st.session_state.pop("assign_report", []): getattr(st, level)(msg)
             try:
-                hw_res = supabase.table("hardware").select("*").eq("status", "Available").execute()
-                available_hw = hw_res.data
-                staff_res = supabase.table("staff").select("*").execute()
-                staff_list = staff_res.data
+                available_hw = repo.select("hardware", "id, item_name, serial_no", [("eq", "status", "Available")], order_by=("id",))
+                staff_list = repo.select("staff", "id, full_name", order_by=("full_name",))
                 if not available_hw: st.warning("No 'Available' hardware found.")
                 elif not staff_list: st.warning("No Staff members found.")
                 else:
-                    with st.form("assign_form"):
-                        hw_options = {f"{h['item_name']} - {h['serial_no']}": h['id'] for h in available_hw}
-                        staff_options = {f"{s['full_name']}": s['id'] for s in staff_list}
-                        s_hw = st.selectbox("Select Hardware", list(hw_options.keys()))
-                        s_staff = st.selectbox("Assign to Staff", list(staff_options.keys()))
-                        if st.form_submit_button("Assign Asset"):
-                            hw_id = hw_options[s_hw]
-                            staff_id = staff_options[s_staff]
-                            supabase.table("hardware").update({"status": "Assigned", "assigned_to_id": staff_id, "assigned_date": pd.Timestamp.now().isoformat()}).eq("id", hw_id).execute()
-                            log_action(st.session_state['username'], "Assign Asset", f"HW {hw_id} -> Staff {staff_id}")
-                            st.success(f"Assigned successfully!")
-                            time.sleep(1)
-                            st.rerun()
+                    hw_options = {f"{h['item_name']} - {h['serial_no']}": h['id'] for h in available_hw}
+                    staff_options = {f"{s['full_name']} (#{s['id']})": s['id'] for s in staff_list}
+                    st.caption("Add one row per device. Devices taken by someone else meanwhile, or listed twice, are reported as conflicts.")
+                    plan = st.data_editor(pd.DataFrame({"Hardware": [None], "Staff": [None]}), num_rows="dynamic",
+                                          use_container_width=True, hide_index=True, key="assign_plan",
+                                          column_config={"Hardware": st.column_config.SelectboxColumn(options=list(hw_options), required=True),
+                                                         "Staff": st.column_config.SelectboxColumn(options=list(staff_options), required=True)})
+                    if st.button("Assign Asset(s)", type="primary"):
+                        rows = plan.dropna()
+                        pairs = [(hw_options[h], staff_options[s]) for h, s in zip(rows["Hardware"], rows["Staff"])]
+                        if not pairs: st.warning("Pick hardware and staff first.")
+                        else:
+                            result = assign_hardware(pairs, st.session_state.get('username'), get_client_ip())
+                            if result is None: st.error("Assignment failed, nothing was changed.")
+                            else:
+                                # A device listed twice is assigned from its first row and also comes back as a
+                                # conflict; report every id once
+                                assigned = [a["hardware_id"] for a in result["assigned"]]
+                                repeated = [i for i in result["conflicts"] if i in assigned]
+                                taken = [i for i in result["conflicts"] if i not in assigned]
+                                report = []
+                                if assigned: report.append(("success", f"Assigned {len(assigned)} device(s): HW {', '.join(map(str, assigned))}"))
+                                if repeated: report.append(("warning", f"Listed more than once, assigned from the first row only: HW {', '.join(map(str, repeated))}"))
+                                if taken: report.append(("error", f"Not assigned (taken by someone else meanwhile): HW {', '.join(map(str, taken))}"))
+                                # Rerun so the plan and the device list reflect what is now assigned
+                                st.session_state["assign_report"] = report
+                                st.session_state.pop("assign_plan", None)
+                                st.rerun()
             except Exception as e: st.error(f"Error loading assignment data: {e}")
 
     # --- STAFF (POPUP EDIT) ---
     elif menu == "Staff" and role == 'admin':
         st.title("👥 Staff Directory")
-        df = get_data("staff")
         tab1, tab2 = st.tabs(["Directory (Edit)", "Add & Upload"])
         
         with tab1:
+            staff_search = st.text_input("Search Staff", placeholder="Name, employee number, email...", key="staff_search")
+            df = search_table(repo, "staff", staff_search) if staff_search else paged_data("staff", "staff")
             if not df.empty:
                 if "Select" not in df.columns: df.insert(0, "Select", False)
-                edited = st.data_editor(df, hide_index=True, disabled=["id", "created_at", "full_name", "email", "department", "employee_number", "doj"])
+                edited = st.data_editor(df, hide_index=True, disabled=["_score", "id", "created_at", "full_name", "email", "department", "employee_number", "doj"])
                 
                 c_edit, c_del = st.columns([1, 4])
                 
@@ -682,11 +789,10 @@ def main_app():
                 emp_no = st.text_input("Employee Number")
                 doj = st.date_input("Date of Joining", value=None)
                 if st.form_submit_button("Save"):
-                    data = {"full_name": name, "email": email, "department": dept, "employee_number": emp_no}
-                    if doj: data["doj"] = str(doj)
-                    supabase.table("staff").insert(data).execute()
-                    st.success("Saved!")
-                    st.rerun()
+                    if add_staff_member(name, email=email, department=dept, employee_number=emp_no, doj=str(doj) if doj else None):
+                        st.success("Saved!")
+                        st.rerun()
+                    else: st.error("Save failed.")
             st.divider()
             st.subheader("📂 Bulk Upload")
             c_dl, c_up = st.columns([1, 2])
@@ -696,21 +802,17 @@ def main_app():
             with c_up:
                 up_file = st.file_uploader("Upload CSV", type=['csv'], key='st_csv')
                 if up_file and st.button("Process Staff"):
-                    try:
-                        data = pd.read_csv(up_file)
-                        supabase.table("staff").insert(data.to_dict('records')).execute()
-                        st.success("Uploaded!")
-                        st.rerun()
+                    try: run_bulk_import("staff", up_file)
                     except Exception as e: st.error(f"Error: {e}")
 
     # --- USERS (POPUP EDIT) ---
     elif menu == "Users" and role == 'admin':
         st.title("🔐 User Management")
-        df = get_data("users")
         tab1, tab2, tab3, tab4 = st.tabs(["Edit Users", "Create User", "Bulk Upload", "Reset Password"])
         
         with tab1:
             st.subheader("✏️ Edit User Roles")
+            df = paged_data("users", "users")
             if not df.empty:
                 # Add Select Column manually since we don't have it in DB
                 if "Select" not in df.columns: df.insert(0, "Select", False)
@@ -734,13 +836,10 @@ def main_app():
                 p = st.text_input("Password (Visible)", type="default")
                 r = st.selectbox("Role", ["admin", "user", "manager"])
                 if st.form_submit_button("Create User"):
-                    try:
-                        hashed = hash_password(p)
-                        data = {"username": u, DB_PASS_COL: hashed, "role": r}
-                        supabase.table("users").insert(data).execute()
+                    if create_user(u, p, r):
                         st.success("User Created!")
                         st.rerun()
-                    except Exception as e: st.error(f"Error: {e}")
+                    else: st.error("Could not create the user (is the username taken?).")
         
         with tab3:
             st.subheader("📂 Bulk Upload Users")
@@ -751,28 +850,21 @@ def main_app():
             with c_up:
                 up_file = st.file_uploader("Upload CSV", type=['csv'], key='us_csv')
                 if up_file and st.button("Process Users"):
-                    try:
-                        data = pd.read_csv(up_file)
-                        records = []
-                        for _, row in data.iterrows():
-                            rec = row.to_dict()
-                            if 'password' in rec:
-                                rec[DB_PASS_COL] = hash_password(str(rec['password']))
-                                if DB_PASS_COL != 'password': del rec['password']
-                            records.append(rec)
-                        supabase.table("users").insert(records).execute()
-                        st.success(f"Created {len(records)} users!")
-                        st.rerun()
+                    hash_bar = st.progress(0.0, text="Hashing passwords...")
+                    on_hash = lambda done, total: hash_bar.progress(done / total, text=f"Hashed {done}/{total} (batch)")
+                    try: run_bulk_import("users", up_file, prepare=lambda batch: hash_user_passwords(batch, on_hash))
                     except Exception as e: st.error(f"Error: {e}")
 
         with tab4:
             st.subheader("🔑 Reset User Password")
-            if not df.empty:
+            usernames = get_column("users", "username")
+            if usernames:
                 st.info("Select a user below to force-reset their password.")
-                target_user = st.selectbox("Select User", df['username'].tolist())
+                target_user = st.selectbox("Select User", usernames)
                 new_pass = st.text_input("New Password", type="default")
                 if st.button("Update Password"):
-                    if update_password(target_user, new_pass):
+                    if change_user_password(target_user, new_pass):
+                        log_action(st.session_state.get('username'), "Update Password", target_user)
                         st.success(f"✅ Password for '{target_user}' has been updated!")
                         time.sleep(1)
                         st.rerun()
@@ -780,9 +872,78 @@ def main_app():
 
     elif menu == "Logs" and role == 'admin':
         st.title("📜 Audit Logs")
-        df = get_data("logs")
-        if not df.empty:
-            st.dataframe(df.sort_values(by="timestamp", ascending=False), use_container_width=True)
+        tab_live, tab_analytics, tab_archive = st.tabs(["Live Logs", "Analytics", "Archive"])
+        with tab_live:
+            f1, f2, f3, f4 = st.columns([1, 1, 1, 2])
+            f_user = f1.text_input("User")
+            f_action = f2.text_input("Action starts with", help="Case-sensitive, e.g. 'Login' or 'Delete'")
+            f_target = f3.text_input("Target contains")
+            f_dates = f4.date_input("Date Range", value=(datetime.now() - timedelta(days=7), datetime.now()))
+            # Every filter maps onto an index added by fix_db.py (timestamp, user, action, target trigram)
+            filters = []
+            if f_user: filters.append(("eq", "user", f_user.strip()))
+            # Case-sensitive on purpose: only LIKE 'prefix%' can use the text_pattern_ops index, ILIKE can't
+            if f_action: filters.append(("like", "action", f"{f_action.strip()}%"))
+            if f_target: filters.append(("ilike", "target", f"%{f_target.strip()}%"))
+            if len(f_dates) == 2:
+                filters.append(("gte", "timestamp", str(f_dates[0])))
+                filters.append(("lt", "timestamp", str(f_dates[1] + timedelta(days=1))))
+            df = paged_data("logs", "logs", order_by=("timestamp", "id"), desc=True, filters=filters)
+            if not df.empty:
+                st.dataframe(df, use_container_width=True, hide_index=True)
+            else:
+                st.info("No log entries match these filters.")
+
+        with tab_analytics:
+            # Aggregated in streamed chunks by analytics.py; results cached per window
+            g1, g2, g3 = st.columns([2, 1, 1])
+            g_dates = g1.date_input("Window", value=(datetime.now() - timedelta(days=7), datetime.now()), key="an_dates")
+            g_freq = g2.selectbox("Granularity", list(FREQS))
+            g_by = g3.selectbox("Breakdown", list(BREAKDOWNS), format_func=lambda b: " × ".join(BREAKDOWNS[b]))
+            result = None
+            if len(g_dates) == 2:
+                try: result = get_log_analytics(g_dates[0], g_dates[1], FREQS[g_freq])
+                except Exception as e: st.error(f"Could not load log analytics: {e}")
+            if result:
+                st.caption(f"{result['rows']} log entries analysed")
+                counts = result["counts"].get(g_by, pd.DataFrame())
+                cols = BREAKDOWNS[g_by]
+                if len(cols) == 2 and not counts.empty:
+                    pick = st.selectbox(f"Filter {cols[0]}", sorted(counts[cols[0]].unique()))
+                    counts = counts[counts[cols[0]] == pick]
+                chart = top_series(counts, cols[-1]) if not counts.empty else pd.DataFrame()
+                if chart.empty: st.info("No log entries in this window.")
+                else:
+                    st.line_chart(chart)
+                    with st.expander("Table"): st.dataframe(counts, hide_index=True, use_container_width=True)
+                st.subheader("🚨 Anomalies")
+                if result["anomalies"].empty: st.success("Nothing unusual in this window.")
+                else: st.dataframe(result["anomalies"], hide_index=True, use_container_width=True)
+
+        with tab_archive:
+            st.subheader("🗄️ Archived Logs")
+            months = archived_months()
+            st.caption(f"Archived months: {', '.join(months) if months else 'none yet'}")
+            a1, a2, a3 = st.columns([2, 1, 1])
+            a_dates = a1.date_input("Archived Range", value=(datetime.now() - timedelta(days=365), datetime.now()), key="arch_dates")
+            a_user = a2.text_input("User", key="arch_user")
+            a_action = a3.text_input("Action", key="arch_action")
+            if st.button("🔎 Search Archive") and len(a_dates) == 2:
+                try:
+                    df_arch = query_archive(a_dates[0], a_dates[1], user=a_user.strip() or None, action=a_action.strip() or None)
+                    if df_arch.empty: st.info("No archived entries in this range.")
+                    else: st.dataframe(df_arch, use_container_width=True, hide_index=True)
+                except Exception as e: st.error(f"❌ Could not read the archive: {e}")
+            st.divider()
+            days = st.number_input("Archive entries older than (days)", min_value=1, value=get_retention_days())
+            if st.button("📦 Run Archival Now"):
+                status = st.empty()
+                try:
+                    moved = archive_logs(days, on_progress=lambda n: status.caption(f"Archived {n} rows..."))
+                    log_action(st.session_state['username'], "Archive Logs", f"{moved} rows older than {days} days")
+                    st.success(f"Archived {moved} rows.")
+                except Exception as e:
+                    st.error(f"❌ Archival stopped: {e}")
 
 # --- EXECUTION START ---
 if st.session_state['logged_in']:
@@ -0,0 +1,87 @@
+import threading
+import time
+from functools import wraps
+import streamlit as st
+
+DEFAULT_TTL = 60
+MAX_ENTRIES = 500
+
+# --- 🗃️ PER-TABLE RESULT CACHE ---
+class TableCache:
+    """Process-wide query cache. Every entry is tagged with the tables it reads,
+    so a write to one table only drops the results that depend on it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (expires_at, tables, value)
+        self._versions = {}  # table -> write counter
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tables, key, loader, ttl=DEFAULT_TTL):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return _copy(entry[2])
+            self.misses += 1
+            seen = {t: self._versions.get(t, 0) for t in tables}
+        value = loader()
+        with self._lock:
+            # A write landed while we were loading, so the value may predate it; hand it out but don't keep it
+            if any(self._versions.get(t, 0) != v for t, v in seen.items()): return _copy(value)
+            if len(self._entries) >= MAX_ENTRIES: self._evict(now)
+            self._entries[key] = (now + ttl, frozenset(tables), value)
+        return _copy(value)
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for t in tables: self._versions[t] = self._versions.get(t, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps.intersection(tables)]
+            for k in stale: del self._entries[k]
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def _evict(self, now):
+        expired = [k for k, e in self._entries.items() if e[0] <= now]
+        for k in expired: del self._entries[k]
+        if len(self._entries) >= MAX_ENTRIES:
+            oldest = sorted(self._entries, key=lambda k: self._entries[k][0])[:MAX_ENTRIES // 10 or 1]
+            for k in oldest: del self._entries[k]
+
+def _copy(value):
+    # Callers mutate what they get back (e.g. df.insert("Select")), so never hand out the cached object
+    return value.copy() if hasattr(value, "copy") else value
+
+@st.cache_resource
+def get_cache():
+    return TableCache()
+
+# --- HELPERS ---
+
+def cached(tables, key, loader, ttl=DEFAULT_TTL):
+    if isinstance(tables, str): tables = (tables,)
+    return get_cache().get(tables, key, loader, ttl)
+
+def cached_query(*tables, ttl=DEFAULT_TTL):
+    """Decorator version of `cached`; the key is the function name plus its arguments."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__name__, args, tuple(sorted(kwargs.items())))
+            return cached(tables, key, lambda: func(*args, **kwargs), ttl)
+        return wrapper
+    return decorator
+
+def invalidate(*tables):
+    get_cache().invalidate(*tables)
+
+def cache_stats():
+    return get_cache().stats()
@@ -1,233 +1,320 @@
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
 import streamlit as st
-import psycopg2
+from psycopg2 import pool
+from cache import cached_query, invalidate
+from repository import PostgresRepository, SqliteRepository, SupabaseRepository
 
-# --- DATABASE CONNECTION ---
-def connect():
+# --- DATABASE CONNECTION (POOLED) ---
+HEALTHCHECK_AFTER = 30  # seconds idle before a borrowed connection is pinged
+BORROW_TIMEOUT = 10
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool that blocks (up to BORROW_TIMEOUT) instead of failing when exhausted."""
+
+    def __init__(self, minconn, maxconn, **conn_kwargs):
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=BORROW_TIMEOUT):
+            raise pool.PoolError("connection pool exhausted")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            broken = bool(conn.closed)
+            if not broken:
+                try: conn.rollback()  # never hand out a connection with an open transaction
+                except Exception: broken = True
+            if broken: self._last_used.pop(id(conn), None)
+            else: self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=broken)
+        finally:
+            self._slots.release()
+
+    def _is_healthy(self, conn):
+        if conn.closed: return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < HEALTHCHECK_AFTER: return True
+        try:
+            with conn.cursor() as cur: cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def closeall(self):
+        self._pool.closeall()
+
+@st.cache_resource
+def get_pool():
+    db_config = st.secrets["connections"]["postgresql"]
+    return ConnectionPool(
+        int(db_config.get("pool_min", 1)),
+        int(db_config.get("pool_max", 10)),
+        host=db_config["host"],
+        user=db_config["username"],
+        password=db_config["password"],
+        port=db_config["port"],
+        dbname=db_config["database"],
+        sslmode='require'
+    )
+
+@contextmanager
+def get_connection():
+    """Borrows a pooled connection (None if the database is unreachable) and returns it on exit."""
     try:
-        db_config = st.secrets["connections"]["postgresql"]
-        return psycopg2.connect(
-            host=db_config["host"],
-            user=db_config["username"],
-            password=db_config["password"],
-            port=db_config["port"],
-            dbname=db_config["database"],
-            sslmode='require'
-        )
+        db_pool = get_pool()
+        conn = db_pool.getconn()
     except Exception as e:
         st.error(f"Cloud Connection Error: {e}")
-        return None
+        yield None
+        return
+    try:
+        yield conn
+    finally:
+        db_pool.putconn(conn)
 
-# --- READ HELPER FUNCTIONS (⚡ CACHED) ---
+# --- 🧩 DATA ACCESS (one repository for every table, see repository.py) ---
 
-@st.cache_data(ttl=60)
-def get_dashboard_stats():
-    conn = connect()
-    if not conn: return {}
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM assets")
-        sub_total = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM assets WHERE expiry_date < CURRENT_DATE")
-        sub_expired = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM hardware")
-        hw_total = cur.fetchone()[0]
-        cur.execute("SELECT COUNT(*) FROM hardware WHERE status='Assigned'")
-        hw_assigned = cur.fetchone()[0]
-        return {
-            "sub_total": sub_total, "sub_expired": sub_expired,
-            "hw_total": hw_total, "hw_assigned": hw_assigned
-        }
+def _secret(section):
+    try: return dict(st.secrets[section])
     except Exception: return {}
-    finally: conn.close()
 
-@st.cache_data(ttl=300)
-def get_department_counts():
-    conn = connect()
-    if not conn: return {}
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT department, COUNT(*) FROM assets GROUP BY department")
-        return dict(cur.fetchall())
+@st.cache_resource
+def get_repository():
+    """The process-wide Repository. `[data] backend = "supabase" | "postgres" | "sqlite"` picks one;
+    otherwise Supabase is used when configured, then Postgres. The offline SQLite stand-in is only
+    ever used when asked for explicitly, so missing secrets fail loudly instead of serving an empty app."""
+    cfg = _secret("data")
+    backend = cfg.get("backend") or ("supabase" if _secret("supabase") else
+                                     "postgres" if _secret("connections").get("postgresql") else None)
+    if backend == "supabase":
+        from supabase import create_client  # optional when running against Postgres or offline
+        return SupabaseRepository(create_client(st.secrets["supabase"]["url"], st.secrets["supabase"]["key"]))
+    if backend == "postgres":
+        return PostgresRepository(get_connection)
+    if backend == "sqlite":
+        repo = SqliteRepository(cfg.get("sqlite_path", ":memory:"))
+        if not repo.count("users"): _seed_offline_admin(repo, cfg)
+        return repo
+    raise RuntimeError('no database configured: add [supabase] or [connections.postgresql] secrets, '
+                       'or set [data] backend = "sqlite" to run offline')
+
+def _seed_offline_admin(repo, cfg):
+    from passwords import hash_password
+    username = cfg.get("admin_user", "admin")
+    password = cfg.get("admin_password") or secrets.token_urlsafe(12)
+    repo.insert("users", [{"username": username, "password_hash": hash_password(password), "role": "admin"}])
+    shown = "from [data] admin_password" if cfg.get("admin_password") else f"password: {password}"
+    print(f"Offline mode: seeded admin user '{username}' in the local SQLite stand-in ({shown})")
+
+# --- READ HELPER FUNCTIONS (⚡ CACHED, see cache.py) ---
+
+@cached_query("assets", "hardware", ttl=60)
+def get_dashboard_counters():
+    """All rows of the dashboard_counters summary table (kept current by triggers, see fix_db.py)
+    as {metric: {bucket: value}}. One small read instead of COUNT(*) scans."""
+    try: rows = get_repository().select("dashboard_counters", filters=[("neq", "value", 0)])
     except Exception: return {}
-    finally: conn.close()
+    counters = {}
+    for row in rows:
+        counters.setdefault(row["metric"], {})[row["bucket"] or None] = row["value"]
+    return counters
 
-@st.cache_data(ttl=60)
-def get_hardware_status_counts():
-    conn = connect()
-    if not conn: return {}
+def reconcile_dashboard_counters():
+    """Recomputes dashboard_counters from the base tables and fixes any drift
+    (e.g. after TRUNCATE or manual SQL). Returns the number of corrected rows.
+    Locks assets and hardware against writes while it counts, so it is never run from a page
+    load: fix_db.py schedules it nightly with pg_cron where available and offers a button."""
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT status, COUNT(*) FROM hardware GROUP BY status")
-        return dict(cur.fetchall())
+        drift = get_repository().rpc("reconcile_dashboard_counters", {})
+        if drift: invalidate("assets", "hardware")
+        return drift
+    except Exception as e:
+        print(f"Reconcile Error: {e}")
+        return None
+
+@cached_query("assets", "hardware", ttl=60)
+def get_dashboard_stats():
+    counters = get_dashboard_counters()
+    # Expiry depends on today's date, so it cannot be a trigger-maintained counter
+    try: sub_expired = get_repository().count("assets", [("lt", "expiry_date", date.today())])
     except Exception: return {}
-    finally: conn.close()
+    return {
+        "sub_total": counters.get("assets", {}).get(None, 0), "sub_expired": sub_expired,
+        "hw_total": counters.get("hardware", {}).get(None, 0),
+        "hw_assigned": counters.get("hardware_by_status", {}).get("Assigned", 0)
+    }
+
+def get_department_counts():
+    return get_dashboard_counters().get("assets_by_department", {})
+
+def get_hardware_status_counts():
+    return get_dashboard_counters().get("hardware_by_status", {})
+
+@cached_query("logs", ttl=60)
+def get_log_count(start_date=None, end_date=None):
+    filters = []
+    if start_date and end_date:
+        filters = [("gte", "timestamp", start_date), ("lt", "timestamp", end_date + timedelta(days=1))]
+    try: return get_repository().count("logs", filters)
+    except Exception: return 0
 
-@st.cache_data(ttl=60)
+@cached_query("staff", ttl=60)
 def get_all_staff():
-    conn = connect()
-    if not conn: return []
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT id, full_name, username FROM staff")
-        return cur.fetchall()
+    try: return [(r["id"], r["full_name"], r["username"]) for r in get_repository().select("staff", "id, full_name, username")]
     except Exception: return []
-    finally: conn.close()
 
-@st.cache_data(ttl=60)
+@cached_query("users", ttl=60)
 def get_all_users():
-    conn = connect()
-    if not conn: return []
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT id, username, role FROM users ORDER BY id ASC")
-        return cur.fetchall()
+    try: return [(r["id"], r["username"], r["role"]) for r in get_repository().select("users", "id, username, role", order_by=("id",))]
     except Exception: return []
-    finally: conn.close()
+
+# --- WRITE HELPERS ---
+
+def _values(**values):
+    # Optional form fields left empty are not written (e.g. no date picked keeps the stored one)
+    return {k: v for k, v in values.items() if v is not None}
+
+def _write(tables, action, error_label=None):
+    """Runs one repository write; invalidates `tables` on success. Returns its result, or None on error."""
+    try:
+        result = action(get_repository())
+        invalidate(*tables)
+        return result
+    except Exception as e:
+        if error_label: print(f"{error_label}: {e}")
+        return None
+
+# --- BULK FUNCTIONS ---
+
+DELETABLE_TABLES = {"assets", "hardware", "staff", "users", "tickets"}
+
+DELETE_CHUNK = 200  # ids per DELETE ... WHERE id IN (...) request
+
+def delete_rows(table, ids, user=None, ip_address=None, chunk_size=DELETE_CHUNK, on_progress=None):
+    """Deletes `ids` with chunked `id IN (...)` requests and records a single audit entry listing
+    the deleted ids. Returns one {"ids", "deleted", "error"} result per chunk.
+
+    Where the backend supports it (Postgres, SQLite) every chunk and the audit entry commit in ONE
+    transaction, so a failed chunk rolls everything back. Over PostgREST each chunk commits on its
+    own and a failed chunk leaves earlier chunks deleted.
+    """
+    if table not in DELETABLE_TABLES: raise ValueError(f"Unknown table: {table}")
+    ids = [i.item() if hasattr(i, "item") else i for i in ids]  # numpy ints from DataFrame selections
+    repo, results = get_repository(), []
+
+    def run(stop_on_error):
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            try:
+                deleted = _delete_chunk(repo, table, chunk)
+                results.append({"ids": chunk, "deleted": deleted, "error": None})
+            except Exception as e:
+                results.append({"ids": chunk, "deleted": [], "error": str(e)})
+                if stop_on_error: raise
+            if on_progress: on_progress(min(start + chunk_size, len(ids)), len(ids))
+        deleted = [i for r in results for i in r["deleted"]]
+        if user and deleted:
+            repo.insert("logs", [{"user": user, "action": "Bulk Delete", "target": f"{table} ids={deleted}",
+                                  "ip_address": ip_address}])
+
+    if repo.supports_transactions:
+        try:
+            with repo.transaction(): run(stop_on_error=True)
+        except Exception as e:
+            print(f"Error bulk deleting from {table}: {e}")
+            results = [{"ids": ids, "deleted": [], "error": f"rolled back: {e}"}]
+    else:
+        try: run(stop_on_error=False)
+        except Exception as e: print(f"Bulk Delete audit error: {e}")  # rows are gone; only the log entry failed
+    invalidate(table, "logs", *(("hardware",) if table == "staff" else ()))
+    return results
+
+def _delete_chunk(repo, table, ids):
+    if table == "staff":
+        # Their devices go back to 'Available' in the same transaction; over PostgREST the
+        # delete_staff() function does both in one request (see fix_db.py)
+        if not repo.supports_transactions: return [row["id"] for row in repo.rpc("delete_staff", {"p_staff_ids": ids})]
+        repo.update("hardware", {"assigned_to_id": None, "status": "Available"}, [("in_", "assigned_to_id", ids)])
+    return [row["id"] for row in repo.delete(table, [("in_", "id", ids)])]
 
 # --- ASSET FUNCTIONS (The missing part!) ---
 
 def add_asset(item, ref, expiry, cat, dept, supp):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("INSERT INTO assets (item_name, reference_no, expiry_date, category, department, supplier) VALUES (%s, %s, %s, %s, %s, %s)", 
-                    (item, ref, expiry, cat, dept, supp))
-        conn.commit()
-        get_dashboard_stats.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
+    row = {"item_name": item, "reference_no": ref, "expiry_date": expiry, "category": cat, "department": dept, "supplier": supp}
+    return _write(("assets",), lambda r: r.insert("assets", [row]), "Error adding asset") is not None
 
 def delete_asset(asset_id):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM assets WHERE id = %s", (asset_id,))
-        conn.commit()
-        get_dashboard_stats.clear()
-        return True
-    except Exception as e:
-        print(f"Error deleting asset: {e}")
-        return False
-    finally:
-        conn.close()
+    return _write(("assets",), lambda r: r.delete("assets", [("eq", "id", asset_id)]), "Error deleting asset") is not None
 
 def update_asset(asset_id, item, ref, expiry, cat, dept, supp):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE assets 
-            SET item_name=%s, reference_no=%s, expiry_date=%s, category=%s, department=%s, supplier=%s 
-            WHERE id=%s
-        """, (item, ref, expiry, cat, dept, supp, asset_id))
-        conn.commit()
-        get_dashboard_stats.clear()
-        return True
-    except Exception as e:
-        print(f"Error updating asset: {e}")
-        return False
-    finally:
-        conn.close()
+    values = _values(item_name=item, reference_no=ref, expiry_date=expiry, category=cat, department=dept, supplier=supp)
+    return _write(("assets",), lambda r: r.update("assets", values, [("eq", "id", asset_id)]), "Error updating asset") is not None
 
 # --- STAFF FUNCTIONS ---
 
-def add_staff_member(name, user, email, phone, gender, dob, created_by_user):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("INSERT INTO staff (full_name, username, email, phone, gender, dob, created_by) VALUES (%s, %s, %s, %s, %s, %s, %s)", 
-                    (name, user, email, phone, gender, dob, created_by_user))
-        conn.commit()
-        get_all_staff.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
-
-def delete_staff(staff_id):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("UPDATE hardware SET assigned_to_id = NULL, status = 'Available' WHERE assigned_to_id = %s", (staff_id,))
-        cur.execute("DELETE FROM staff WHERE id = %s", (staff_id,))
-        conn.commit()
-        get_all_staff.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
+def add_staff_member(name, user=None, email=None, phone=None, gender=None, dob=None, created_by_user=None,
+                     department=None, employee_number=None, doj=None):
+    row = _values(full_name=name, username=user, email=email, phone=phone, gender=gender, dob=dob, created_by=created_by_user,
+                  department=department, employee_number=employee_number, doj=doj)
+    return _write(("staff",), lambda r: r.insert("staff", [row]), "Error adding staff") is not None
+
+def update_staff(staff_id, name, email, department, employee_number, doj=None):
+    values = _values(full_name=name, email=email, department=department, employee_number=employee_number, doj=doj)
+    return _write(("staff",), lambda r: r.update("staff", values, [("eq", "id", staff_id)]), "Error updating staff") is not None
+
+def delete_staff(staff_id, user=None):
+    """Deletes one person and releases their hardware atomically (see delete_rows)."""
+    results = delete_rows("staff", [staff_id], user)
+    return not any(r["error"] for r in results)
 
 # --- HARDWARE FUNCTIONS ---
 
-def add_hardware(name, serial, model, status):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("INSERT INTO hardware (item_name, serial_no, model, status) VALUES (%s, %s, %s, %s)", 
-                    (name, serial, model, status))
-        conn.commit()
-        get_dashboard_stats.clear()
-        get_hardware_status_counts.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
+def add_hardware(name, serial, model, status, asset_code=None, capitalized_date=None):
+    row = _values(item_name=name, serial_no=serial, model=model, status=status, asset_code=asset_code, capitalized_date=capitalized_date)
+    return _write(("hardware",), lambda r: r.insert("hardware", [row]), "Error adding hardware") is not None
+
+def update_hardware(hw_id, name, serial, model, asset_code, status, capitalized_date=None):
+    values = _values(item_name=name, serial_no=serial, model=model, asset_code=asset_code, status=status, capitalized_date=capitalized_date)
+    return _write(("hardware",), lambda r: r.update("hardware", values, [("eq", "id", hw_id)]), "Error updating hardware") is not None
 
 def delete_hardware(hw_id):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM hardware WHERE id = %s", (hw_id,))
-        conn.commit()
-        get_dashboard_stats.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
-
-def update_hardware_status(hw_id, new_status, assigned_to_id=None):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        if assigned_to_id:
-            cur.execute("UPDATE hardware SET status = %s, assigned_to_id = %s, assigned_date = CURRENT_DATE WHERE id = %s", 
-                        (new_status, assigned_to_id, hw_id))
-        else:
-            cur.execute("UPDATE hardware SET status = %s, assigned_to_id = NULL, assigned_date = NULL WHERE id = %s", 
-                        (new_status, hw_id))
-        conn.commit()
-        get_hardware_status_counts.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
+    return _write(("hardware",), lambda r: r.delete("hardware", [("eq", "id", hw_id)])) is not None
+
+def assign_hardware(pairs, user=None, ip_address=None):
+    """Assigns [(hardware_id, staff_id), ...] in one transaction via the assign_hardware()
+    stored procedure (see fix_db.py). Only hardware that is still 'Available' is taken.
+    Returns {"assigned": [{hardware_id, staff_id}], "conflicts": [hardware_id]} or None on error."""
+    payload = [{"hardware_id": hw_id, "staff_id": staff_id} for hw_id, staff_id in pairs]
+    params = {"p_pairs": payload, "p_user": user, "p_ip": ip_address}
+    return _write(("hardware", "logs"), lambda r: r.rpc("assign_hardware", params), "Error assigning hardware")
+
+def update_hardware_status(hw_id, new_status, assigned_to_id=None, user=None):
+    if assigned_to_id:
+        # Assignment must not overwrite someone else's concurrent assignment
+        result = assign_hardware([(hw_id, assigned_to_id)], user)
+        return bool(result and result["assigned"])
+    values = {"status": new_status, "assigned_to_id": None, "assigned_date": None}
+    return _write(("hardware",), lambda r: r.update("hardware", values, [("eq", "id", hw_id)])) is not None
 
 # --- USER FUNCTIONS ---
 
 def delete_user(user_id):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        conn.commit()
-        get_all_users.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
+    return _write(("users",), lambda r: r.delete("users", [("eq", "id", user_id)])) is not None
 
 def update_user_role(user_id, new_role):
-    conn = connect()
-    if not conn: return False
-    try:
-        cur = conn.cursor()
-        cur.execute("UPDATE users SET role = %s WHERE id = %s", (new_role, user_id))
-        conn.commit()
-        get_all_users.clear()
-        return True
-    except Exception: return False
-    finally: conn.close()
\ No newline at end of file
+    return _write(("users",), lambda r: r.update("users", {"role": new_role}, [("eq", "id", user_id)]), "Error updating role") is not None
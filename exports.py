@@ -0,0 +1,124 @@
+import glob
+import gzip
+import io
+import os
+import tempfile
+import time
+import pandas as pd
+
+# --- ⚙️ CONFIGURATION ---
+# label -> (file extension, mime type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_PREFIX = "ims_export_"
+EXPORT_TTL = 3600  # seconds; prepared exports nobody downloaded are deleted after this
+
+def available_formats():
+    try:
+        import pyarrow  # noqa: F401  (optional, only needed for Parquet)
+        return list(FORMATS)
+    except ImportError:
+        return [f for f in FORMATS if f != "Parquet"]
+
+# --- 📤 EXPORT ENGINE ---
+
+def write_export(pages, fmt, rename=None):
+    """Streams an iterable of DataFrame chunks into a temp file on disk and returns its path.
+    Only one chunk is ever held in memory. `read_export` deletes the file once it is downloaded;
+    abandoned ones are swept by `purge_stale_exports` on the next export."""
+    ext, _ = FORMATS[fmt]
+    purge_stale_exports()
+    fd, path = tempfile.mkstemp(suffix=f".{ext}", prefix=EXPORT_PREFIX)
+    os.close(fd)
+    try:
+        if fmt == "Parquet": rows = _write_parquet(path, pages, rename)
+        else: rows = _write_csv(path, pages, rename, compress=fmt == "CSV (gzip)")
+    except Exception:
+        os.remove(path)
+        raise
+    if rows == 0:
+        os.remove(path)
+        return None
+    return path
+
+def read_export(path):
+    """Returns the export's bytes and deletes the file (b"" if it is already gone)."""
+    try:
+        with open(path, "rb") as f: data = f.read()
+    except FileNotFoundError:
+        return b""
+    remove_export(path)
+    return data
+
+def remove_export(path):
+    try: os.remove(path)
+    except FileNotFoundError: pass
+
+def purge_stale_exports(max_age=EXPORT_TTL):
+    """Deletes export files older than `max_age` seconds: abandoned downloads, expired sessions."""
+    cutoff = time.time() - max_age
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{EXPORT_PREFIX}*")):
+        try:
+            if os.path.getmtime(path) < cutoff: os.remove(path)
+        except OSError: pass  # removed concurrently by another session
+
+def _project(df, rename):
+    return df.reindex(columns=list(rename)).rename(columns=rename) if rename else df
+
+def _write_csv(path, pages, rename, compress):
+    raw = gzip.open(path, "wb") if compress else open(path, "wb")
+    rows = 0
+    with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+        for df in pages:
+            _project(df, rename).to_csv(out, index=False, header=rows == 0)
+            rows += len(df)
+    return rows
+
+# Parquet column types, by source column name; the tables share these conventions.
+# Anything not listed here is written as nullable string.
+DATE_COLUMNS = {"expiry_date", "dob", "doj", "capitalized_date", "assigned_date"}
+TIMESTAMP_COLUMNS = {"created_at", "timestamp"}
+
+def _column_type(name):
+    import pyarrow as pa
+    if name == "id" or name.endswith("_id"): return pa.int64()
+    if name in DATE_COLUMNS: return pa.date32()
+    if name in TIMESTAMP_COLUMNS: return pa.timestamp("us", tz="UTC")
+    return pa.string()
+
+def _as_text(col):
+    # pandas turns an int column with gaps into float; keep "7", not "7.0"
+    if pd.api.types.is_float_dtype(col) and (col.dropna() % 1 == 0).all(): col = col.astype("Int64")
+    return col.astype("string")
+
+def _cast(col, typ):
+    import pyarrow as pa
+    if pa.types.is_integer(typ): col = pd.to_numeric(col, errors="coerce").astype("Int64")
+    elif pa.types.is_date(typ): col = pd.to_datetime(col, errors="coerce", utc=True, format="ISO8601").dt.date
+    elif pa.types.is_timestamp(typ): col = pd.to_datetime(col, errors="coerce", utc=True, format="ISO8601")
+    else: col = _as_text(col)
+    return pa.array(col, type=typ, from_pandas=True)
+
+def _write_parquet(path, pages, rename):
+    """Each column gets one fixed type from its name (ids Int64, dates, timestamps) and every page is
+    cast to it, so a column that is empty in the first page or gains gaps later cannot change type
+    halfway through the file. Columns of unknown type are written as nullable string."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer, columns, types, rows = None, None, None, 0
+    try:
+        for df in pages:
+            if writer is None:
+                columns = list(rename) if rename else list(df.columns)
+                types = {c: _column_type(str(c)) for c in columns}
+                names = [str(rename[c]) if rename else str(c) for c in columns]
+                writer = pq.ParquetWriter(path, pa.schema(list(zip(names, types.values()))), compression="snappy")
+            df = df.reindex(columns=columns)
+            writer.write_table(pa.Table.from_arrays([_cast(df[c], types[c]) for c in columns], schema=writer.schema))
+            rows += len(df)
+    finally:
+        if writer: writer.close()
+    return rows
@@ -1,10 +1,175 @@
 import streamlit as st
 import psycopg2
+from search import search_migrations
+from database import reconcile_dashboard_counters
+from snapshots import snapshot_migrations
+
+# Tables whose row counts (total + per bucket column) are kept in dashboard_counters
+COUNTED_TABLES = {"assets": "department", "hardware": "status"}
+RECONCILE_JOB = "reconcile-dashboard-counters"
+RECONCILE_SCHEDULE = "15 3 * * *"  # pg_cron syntax, server time; off-peak because the recount blocks writes
+
+def counter_migrations():
+    """Statement-level triggers (transition tables) that keep dashboard_counters in sync:
+    one aggregated upsert per INSERT/UPDATE/DELETE statement, however many rows it touches.
+    Buckets whose net change is zero are skipped, so an UPDATE that leaves the bucket column
+    alone never writes (and row-locks) the shared counter rows."""
+    steps = [("Creating dashboard_counters table", """
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            metric TEXT NOT NULL,
+            bucket TEXT NOT NULL DEFAULT '',
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, bucket)
+        );
+    """)]
+    for table, col in COUNTED_TABLES.items():
+        sources = {
+            "INSERT": f"SELECT {col} AS b, 1 AS d FROM new_rows",
+            "DELETE": f"SELECT {col} AS b, -1 AS d FROM old_rows",
+            "UPDATE": f"SELECT {col} AS b, 1 AS d FROM new_rows UNION ALL SELECT {col}, -1 FROM old_rows",
+        }
+        for op, src in sources.items():
+            fn = f"{table}_counters_{op.lower()}"
+            refs = {"INSERT": "NEW TABLE AS new_rows", "DELETE": "OLD TABLE AS old_rows",
+                    "UPDATE": "NEW TABLE AS new_rows OLD TABLE AS old_rows"}[op]
+            steps.append((f"Counting {table} on {op}", f"""
+                CREATE OR REPLACE FUNCTION {fn}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    INSERT INTO dashboard_counters (metric, bucket, value)
+                    SELECT '{table}', '', sum(d) FROM ({src}) s HAVING sum(d) <> 0
+                    UNION ALL
+                    SELECT '{table}_by_{col}', coalesce(b::text, ''), sum(d) FROM ({src}) s GROUP BY 2 HAVING sum(d) <> 0
+                    ON CONFLICT (metric, bucket) DO UPDATE SET value = dashboard_counters.value + EXCLUDED.value;
+                    RETURN NULL;
+                END $$;
+                DROP TRIGGER IF EXISTS trg_{fn} ON {table};
+                CREATE TRIGGER trg_{fn} AFTER {op} ON {table}
+                    REFERENCING {refs} FOR EACH STATEMENT EXECUTE FUNCTION {fn}();
+            """))
+    actual = "\n                UNION ALL ".join(
+        f"SELECT '{t}', '', count(*) FROM {t} UNION ALL SELECT '{t}_by_{c}', coalesce({c}::text, ''), count(*) FROM {t} GROUP BY 2"
+        for t, c in COUNTED_TABLES.items())
+    steps.append(("Creating reconcile_dashboard_counters() function", f"""
+        CREATE OR REPLACE FUNCTION reconcile_dashboard_counters() RETURNS integer LANGUAGE plpgsql AS $$
+        DECLARE
+            drift integer;
+        BEGIN
+            -- Block writers for the duration of the recount so counts and triggers cannot interleave
+            LOCK TABLE {", ".join(COUNTED_TABLES)} IN SHARE MODE;
+            WITH actual (metric, bucket, value) AS (
+                {actual}
+            ), fixed AS (
+                INSERT INTO dashboard_counters AS c (metric, bucket, value) SELECT * FROM actual
+                ON CONFLICT (metric, bucket) DO UPDATE SET value = EXCLUDED.value WHERE c.value <> EXCLUDED.value
+                RETURNING 1
+            ), removed AS (
+                DELETE FROM dashboard_counters c
+                WHERE NOT EXISTS (SELECT 1 FROM actual a WHERE a.metric = c.metric AND a.bucket = c.bucket)
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM fixed) + (SELECT count(*) FROM removed) INTO drift;
+            RETURN drift;
+        END $$;
+    """))
+    steps.append(("Seeding dashboard_counters", "SELECT reconcile_dashboard_counters();"))
+    # Scheduling by job name replaces an existing job, so re-running keeps one entry. pg_cron needs
+    # shared_preload_libraries (enabled on Supabase); without it the button below is the only way.
+    steps.append(("Scheduling nightly counter reconciliation (pg_cron)", f"""
+        DO $$
+        BEGIN
+            BEGIN
+                CREATE EXTENSION IF NOT EXISTS pg_cron;
+            EXCEPTION WHEN others THEN
+                RAISE NOTICE 'pg_cron unavailable: %', SQLERRM;
+            END;
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+                PERFORM cron.schedule('{RECONCILE_JOB}', '{RECONCILE_SCHEDULE}', 'SELECT reconcile_dashboard_counters()');
+            END IF;
+        END $$;
+    """))
+    return steps
+
+# Every step is idempotent, so the whole list can be re-run safely after adding new ones.
+MIGRATIONS = [
+    ("Adding 'ip_address' column", "ALTER TABLE logs ADD COLUMN IF NOT EXISTS ip_address TEXT;"),
+    ("Adding 'details' column", "ALTER TABLE logs ADD COLUMN IF NOT EXISTS details TEXT;"),
+    # --- Audit Logs explorer (newest first + filters) ---
+    ("Indexing logs by timestamp", 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_timestamp ON logs ("timestamp" DESC, id DESC);'),
+    ("Indexing logs by user", 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_user_timestamp ON logs ("user", "timestamp" DESC);'),
+    # Serves the explorer's case-sensitive `action LIKE 'prefix%'` filter (text_pattern_ops, so non-C collations work too)
+    ("Indexing logs by action", 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_action_timestamp ON logs (action text_pattern_ops, "timestamp" DESC);'),
+    ("Enabling pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm;"),
+    ("Indexing logs target (trigram)", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_logs_target_trgm ON logs USING gin (target gin_trgm_ops);"),
+    # --- Hardware Master Report (join done in the database) ---
+    ("Indexing hardware by assignee", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_hardware_assigned_to ON hardware (assigned_to_id);"),
+    ("Creating hardware_master_report view", """
+        CREATE OR REPLACE VIEW hardware_master_report AS
+        SELECT h.id, s.employee_number, s.full_name, s.doj, s.department,
+               h.asset_code, h.serial_no, h.model, h.capitalized_date,
+               h.assigned_to_id, h.assigned_date
+        FROM hardware h
+        LEFT JOIN staff s ON s.id = h.assigned_to_id;
+    """),
+    # --- Atomic hardware assignment (conditional update + audit entry in one transaction) ---
+    ("Creating assign_hardware() function", """
+        CREATE OR REPLACE FUNCTION assign_hardware(p_pairs jsonb, p_user text, p_ip text DEFAULT NULL)
+        RETURNS jsonb LANGUAGE plpgsql AS $$
+        DECLARE
+            v_result jsonb;
+        BEGIN
+            -- Only rows still 'Available' are updated; a concurrent assignment makes the
+            -- second UPDATE re-check the WHERE clause and skip the row. A hardware id listed
+            -- more than once is assigned from its first row; the later rows are conflicts.
+            WITH req AS (
+                SELECT hardware_id, staff_id,
+                       row_number() OVER (PARTITION BY hardware_id ORDER BY ord) AS n
+                FROM ROWS FROM (jsonb_to_recordset(p_pairs) AS (hardware_id bigint, staff_id bigint))
+                     WITH ORDINALITY AS r(hardware_id, staff_id, ord)
+            ), upd AS (
+                UPDATE hardware h
+                SET status = 'Assigned', assigned_to_id = req.staff_id, assigned_date = CURRENT_DATE
+                FROM req
+                WHERE h.id = req.hardware_id AND req.n = 1 AND h.status = 'Available'
+                RETURNING h.id AS hardware_id, req.staff_id
+            ), audit AS (
+                INSERT INTO logs ("user", action, target, ip_address, "timestamp")
+                SELECT p_user, 'Assign Asset', format('HW %s -> Staff %s', hardware_id, staff_id), p_ip, now()
+                FROM upd
+            )
+            SELECT jsonb_build_object(
+                'assigned', (SELECT coalesce(jsonb_agg(jsonb_build_object('hardware_id', hardware_id, 'staff_id', staff_id)), '[]'::jsonb)
+                             FROM upd),
+                'conflicts', (SELECT coalesce(jsonb_agg(DISTINCT req.hardware_id), '[]'::jsonb)
+                              FROM req
+                              WHERE req.n > 1 OR NOT EXISTS (SELECT 1 FROM upd WHERE upd.hardware_id = req.hardware_id))
+            ) INTO v_result;
+
+            RETURN v_result;
+        END $$;
+    """),
+    # --- Staff deletion for PostgREST clients (releases their hardware in the same transaction) ---
+    ("Creating delete_staff() function", """
+        DROP FUNCTION IF EXISTS delete_staff(bigint);
+        CREATE OR REPLACE FUNCTION delete_staff(p_staff_ids bigint[])
+        RETURNS TABLE (id bigint) LANGUAGE sql AS $$
+            UPDATE hardware SET assigned_to_id = NULL, status = 'Available' WHERE assigned_to_id = ANY(p_staff_ids);
+            DELETE FROM staff WHERE staff.id = ANY(p_staff_ids) RETURNING staff.id::bigint;
+        $$;
+    """),
+    # --- Expiry alerts (range scans for "expiring within N days") ---
+    ("Indexing assets by expiry date", "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assets_expiry_date ON assets (expiry_date);"),
+    # --- Dashboard summary counters (trigger-maintained; reconciled nightly by pg_cron or on demand below) ---
+    *counter_migrations(),
+    # --- Historical snapshots (after the counters they copy from) ---
+    *snapshot_migrations(),
+    # --- Search (trigram indexes + ranked search_<table>() functions) ---
+    *search_migrations(),
+]
 
 def fix_database():
     st.title("🛠️ Database Fixer")
     
-    if st.button("Run Fix (Add Missing Columns)"):
+    if st.button("Run Migrations"):
         try:
             # Connect using your existing secrets
             db_config = st.secrets["connections"]["postgresql"]
@@ -16,24 +181,32 @@ def fix_database():
                 dbname=db_config["database"],
                 sslmode='require'
             )
+            # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+            conn.autocommit = True
             cur = conn.cursor()
             
-            # 1. Add 'ip_address' column if it doesn't exist
-            st.write("Adding 'ip_address' column...")
-            cur.execute("ALTER TABLE logs ADD COLUMN IF NOT EXISTS ip_address TEXT;")
-            
-            # 2. Add 'details' column if it doesn't exist
-            st.write("Adding 'details' column...")
-            cur.execute("ALTER TABLE logs ADD COLUMN IF NOT EXISTS details TEXT;")
+            for i, (label, sql) in enumerate(MIGRATIONS, 1):
+                st.write(f"{i}. {label}...")
+                cur.execute(sql)
+
+            cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_cron'")
+            if not cur.fetchone():
+                st.warning("⚠️ pg_cron is not available, so dashboard counters are not reconciled automatically. "
+                           "Use the button below, or enable pg_cron and run the migrations again.")
             
-            conn.commit()
             cur.close()
             conn.close()
             
-            st.success("✅ Success! Database columns added. You can now delete this file and restart your main app.")
+            st.success("✅ Success! Database is up to date. You can now restart your main app.")
             
         except Exception as e:
             st.error(f"❌ Error: {e}")
 
+    # Recounts under a SHARE lock (writes wait), so run it off-peak rather than from the app
+    if st.button("Reconcile Dashboard Counters"):
+        drift = reconcile_dashboard_counters()
+        if drift is None: st.error("❌ Reconcile failed, see the server log.")
+        else: st.success(f"✅ Corrected {drift} counter row(s).")
+
 if __name__ == "__main__":
-    fix_database()
\ No newline at end of file
+    fix_database()
@@ -0,0 +1,166 @@
+import pandas as pd
+
+# --- ⚙️ CONFIGURATION ---
+CHUNK_ROWS = 1000     # rows parsed from the CSV at a time
+INSERT_BATCH = 500    # rows per insert request
+MAX_ERRORS = 5000     # rejected rows kept for the report (the count keeps going)
+
+CATEGORIES = ["Software", "License", "Domain"]
+DEPARTMENTS = ["IT", "HR", "Sales"]
+HW_STATUSES = ["Available", "Assigned", "Broken"]
+ROLES = ["admin", "user", "manager"]
+
+# column -> "text" | "date" | list of allowed values
+TABLE_SCHEMAS = {
+    "assets": {
+        "columns": {"item_name": "text", "reference_no": "text", "expiry_date": "date",
+                    "category": CATEGORIES, "department": DEPARTMENTS, "supplier": "text"},
+        "required": ["item_name", "expiry_date"],
+    },
+    "hardware": {
+        "columns": {"item_name": "text", "serial_no": "text", "model": "text", "status": HW_STATUSES,
+                    "asset_code": "text", "capitalized_date": "date"},
+        "required": ["item_name", "serial_no"],
+        "defaults": {"status": "Available"},
+    },
+    "staff": {
+        "columns": {"full_name": "text", "email": "text", "department": "text",
+                    "employee_number": "text", "doj": "date"},
+        "required": ["full_name"],
+    },
+    "users": {
+        "columns": {"username": "text", "password": "text", "role": ROLES},
+        "required": ["username", "password"],
+        "defaults": {"role": "user"},
+        "verbatim": ["password"],  # leading/trailing spaces are part of a password
+    },
+}
+
+# --- VALIDATION ---
+
+def validate_chunk(df, schema):
+    """Coerces one chunk to the table schema. Returns (records, errors)."""
+    errors = []
+    bad = pd.Series(False, index=df.index)
+    clean = pd.DataFrame(index=df.index)
+
+    for col, kind in schema["columns"].items():
+        if col not in df.columns: continue
+        raw = df[col].fillna("").astype(str)
+        if col not in schema.get("verbatim", ()): raw = raw.str.strip()
+        blank = raw == ""
+        if kind == "date":
+            parsed = pd.to_datetime(raw.where(~blank), errors="coerce")
+            invalid = ~blank & parsed.isna()
+            values = parsed.dt.strftime("%Y-%m-%d")
+            reason = "not a valid date"
+        elif isinstance(kind, list):
+            values = raw.str.lower().map({v.lower(): v for v in kind})
+            invalid = ~blank & values.isna()
+            reason = f"must be one of {', '.join(kind)}"
+        else:
+            values = raw.where(~blank)
+            invalid = pd.Series(False, index=df.index)
+            reason = ""
+        for idx in df.index[invalid]:
+            errors.append({"row": idx + 2, "column": col, "value": raw[idx], "error": reason})
+        bad |= invalid
+        clean[col] = values.astype(object).where(values.notna(), None)
+
+    for col, value in schema.get("defaults", {}).items():
+        clean[col] = clean[col].where(clean[col].notna(), value) if col in clean else value
+
+    for col in schema["required"]:
+        missing = clean[col].isna() if col in clean else pd.Series(True, index=df.index)
+        for idx in df.index[missing & ~bad]:
+            errors.append({"row": idx + 2, "column": col, "value": "", "error": "required"})
+        bad |= missing
+
+    records = []
+    for idx, rec in zip(clean.index[~bad], clean[~bad].to_dict("records")):
+        rec = {k: v for k, v in rec.items() if v is not None}
+        rec["_row"] = idx + 2
+        records.append(rec)
+    return records, errors
+
+# --- IMPORT PIPELINE ---
+
+ROW_ERROR_CLASSES = ("IntegrityError", "DataError")  # DB-API names (psycopg2, sqlite3)
+ROW_ERROR_SQLSTATES = ("22", "23")                    # data exception, integrity constraint violation
+
+class ImportAborted(Exception):
+    """The database failed for a reason other than the rows themselves (e.g. it is unreachable)."""
+
+def is_row_error(exc):
+    """True when the database rejected the data itself (bad value, constraint), so the other rows
+    of the batch may still go in. PostgREST reports the SQLSTATE as `code`, psycopg2 as `pgcode`."""
+    if any(cls.__name__ in ROW_ERROR_CLASSES for cls in type(exc).__mro__): return True
+    code = str(getattr(exc, "code", None) or getattr(exc, "pgcode", None) or "")
+    return code[:2] in ROW_ERROR_SQLSTATES
+
+def import_csv(file, table, insert_fn, prepare=None, on_progress=None):
+    """Streams `file` in CHUNK_ROWS chunks, validates each against TABLE_SCHEMAS[table] and
+    inserts the good rows in INSERT_BATCH batches via `insert_fn(records)`.
+
+    `prepare(records)` can rewrite a batch before insert (e.g. hash passwords).
+    If a batch is rejected by the database it is retried row by row so only the
+    offending rows are reported. Any other failure (connection lost, timeout) stops the
+    import: `aborted` holds the error and `not_attempted` counts the rows never sent.
+    Returns a summary dict with the per-row error report.
+    """
+    schema = TABLE_SCHEMAS[table]
+    report = {"inserted": 0, "rejected": 0, "errors": [], "ignored_columns": [], "aborted": None, "not_attempted": 0}
+
+    def reject(errs):
+        # A row can fail on several columns; count it once
+        report["rejected"] += len({e["row"] for e in errs})
+        room = MAX_ERRORS - len(report["errors"])
+        if room > 0: report["errors"].extend(errs[:room])
+
+    def flush(batch):
+        rows = [r.pop("_row") for r in batch]
+        if prepare: batch = prepare(batch)
+        try:
+            insert_fn(batch)
+            report["inserted"] += len(batch)
+            return
+        except Exception as e:
+            # A lost connection stops here; anything else is split into single-row inserts, and the
+            # first row failing for a reason other than its data stops the import
+            if isinstance(e, (ConnectionError, TimeoutError)): raise ImportAborted(e) from e
+        for i, (row, rec) in enumerate(zip(rows, batch)):
+            try:
+                insert_fn([rec])
+                report["inserted"] += 1
+            except Exception as e:
+                if not is_row_error(e):
+                    report["not_attempted"] += len(batch) - i
+                    raise ImportAborted(e) from e
+                reject([{"row": row, "column": "", "value": "", "error": str(e)}])
+
+    reader = pd.read_csv(file, chunksize=CHUNK_ROWS, dtype=str, keep_default_na=False)
+    pending = []
+    try:
+        for n, chunk in enumerate(reader):
+            chunk.columns = [c.strip() for c in chunk.columns]
+            if n == 0:
+                report["ignored_columns"] = [c for c in chunk.columns if c not in schema["columns"]]
+            records, errors = validate_chunk(chunk, schema)
+            reject(errors)
+            pending.extend(records)
+            while len(pending) >= INSERT_BATCH:
+                batch, pending = pending[:INSERT_BATCH], pending[INSERT_BATCH:]
+                flush(batch)
+            if on_progress: on_progress(report["inserted"], report["rejected"])
+        if pending:
+            batch, pending = pending, []
+            flush(batch)
+    except ImportAborted as e:
+        report["aborted"] = str(e.__cause__ or e)
+        if not report["not_attempted"]: report["not_attempted"] = len(batch)
+        # Counting what is left only parses the CSV; nothing more is sent to the database
+        report["not_attempted"] += len(pending) + sum(len(chunk) for chunk in reader)
+    if on_progress: on_progress(report["inserted"], report["rejected"])
+
+    report["errors"] = pd.DataFrame(report["errors"], columns=["row", "column", "value", "error"])
+    return report
@@ -1,58 +1,200 @@
+import atexit
+import json
+import os
+import ipaddress
+import queue
+import threading
+from datetime import datetime
 import streamlit as st
-import socket
-from requests import get
-from database import connect
+from cache import get_cache
+from database import get_repository
+
+# --- ⚙️ CONFIGURATION ---
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH = 200
+FLUSH_INTERVAL = 2.0  # seconds the worker waits to fill a batch
+SPOOL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs_spool.jsonl")
+
+# --- 🌐 CLIENT IP (memoised per session, no network calls) ---
+
+PROXY_HEADERS = ("Forwarded", "X-Forwarded-For", "X-Real-IP")
+
+def _trusted_hops():
+    """How many reverse proxies we sit behind. None = take the left-most forwarded address."""
+    try: return int(st.secrets["logging"]["trusted_proxy_hops"])
+    except Exception: return None
+
+def _proxy_header():
+    """The one header the proxies write ([logging] proxy_header). None = the first one present."""
+    try: return st.secrets["logging"]["proxy_header"]
+    except Exception: return None
+
+def _clean_ip(value):
+    value = value.strip().strip('"')
+    if value.startswith("["): value = value[1:].split("]")[0]        # [v6]:port
+    elif value.count(":") == 1: value = value.split(":")[0]          # v4:port
+    try: return str(ipaddress.ip_address(value))
+    except ValueError: return None
+
+def _chain_from(name, value):
+    if name.lower() == "forwarded":
+        chain = []
+        for element in value.split(","):
+            for pair in element.split(";"):
+                key, _, val = pair.partition("=")
+                if key.strip().lower() == "for": chain.append(_clean_ip(val))
+        return chain
+    return [_clean_ip(v) for v in value.split(",")]
+
+def _forwarded_chain(headers, header=None):
+    """Client-first list of addresses from `header`, or else from the first of PROXY_HEADERS present."""
+    for name in ([header] if header else PROXY_HEADERS):
+        value = headers.get(name)
+        if value:
+            chain = _chain_from(name, value)
+            if chain: return chain
+    return []
+
+def resolve_client_ip(headers, peer_ip=None, trusted_hops=None, header=None):
+    """With trusted hops, only `header` (default X-Forwarded-For) is read: any other forwarding
+    header passes the proxies untouched, so the client controls it entirely."""
+    if trusted_hops and not header: header = "X-Forwarded-For"
+    chain = _forwarded_chain(headers or {}, header)
+    if chain:
+        # Each trusted proxy appends the address it received from, so with N trusted hops
+        # the client is the N-th entry from the right; anything left of it is client-supplied.
+        ip = chain[0] if not trusted_hops else chain[-min(trusted_hops, len(chain))]
+        if ip: return ip
+    return peer_ip or "Unknown"
 
 def get_client_ip():
-    """Robust IP detection for Local and Cloud."""
+    """Resolved once per session from proxy headers and cached in session state."""
     try:
-        # 1. Cloud / Proxy (Best for deployed apps)
-        if st.context.headers:
-            x_forwarded_for = st.context.headers.get("X-Forwarded-For")
-            if x_forwarded_for:
-                return x_forwarded_for.split(",")[0]
-        
-        # 2. External Public IP (Needs Internet)
-        try:
-            public_ip = get('https://api.ipify.org', timeout=1).text
-            return public_ip
-        except:
-            pass
+        if "client_ip" not in st.session_state:
+            st.session_state["client_ip"] = resolve_client_ip(
+                st.context.headers, getattr(st.context, "ip_address", None), _trusted_hops(), _proxy_header())
+        return st.session_state["client_ip"]
+    except Exception:
+        return "Unknown"
 
-        # 3. Local Network IP (Best for Mac/Windows local dev)
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+# --- 📨 BACKGROUND LOG WRITER ---
+class AuditLogWriter:
+    """Bounded in-process queue drained by one worker thread in multi-row batches.
+    Rows that cannot be written (database down, queue full) are spilled to SPOOL_FILE
+    and replayed after the next successful write."""
+
+    def __init__(self, sink, on_written=None, spool_path=SPOOL_FILE):
+        self._sink = sink
+        self._on_written = on_written
+        self._spool_path = spool_path
+        self._spool_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._closed = False
+        with self._spool_lock: self._merge_leftover_replay()
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        if self._closed: return self._spill([row])
+        try: self._queue.put_nowait(row)
+        except queue.Full: self._spill([row])
+
+    def flush(self, timeout=10):
+        """Blocks until everything submitted so far has been written or spilled."""
+        done = threading.Event()
+        try: self._queue.put(done, timeout=timeout)
+        except queue.Full: return False
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        if self._closed: return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch, markers, stop = [], [], False
+            item = self._queue.get()
+            while True:
+                if item is None: stop = True
+                elif isinstance(item, threading.Event): markers.append(item)
+                else: batch.append(item)
+                if stop or markers or len(batch) >= LOG_BATCH: break
+                try: item = self._queue.get(timeout=FLUSH_INTERVAL)
+                except queue.Empty: break
+            try:
+                if batch: self._write(batch)
+            except Exception as e:
+                # Nothing may end this loop: a dead worker would leave the queue undrained for good
+                print(f"Logging Error (worker): {e}")
+            finally:
+                for m in markers: m.set()
+            if stop: return
+
+    def _write(self, batch):
         try:
-            # Doesn't actually connect, just gets the IP route
-            s.connect(('8.8.8.8', 1))
-            local_ip = s.getsockname()[0]
-        except Exception:
-            local_ip = '127.0.0.1'
-        finally:
-            s.close()
-        return local_ip
+            self._sink(batch)
+        except Exception as e:
+            print(f"Logging Error (spilled {len(batch)} rows): {e}")
+            return self._spill(batch)
+        if self._on_written:
+            try: self._on_written()
+            except Exception as e: print(f"Logging Error (on_written): {e}")
+        self._replay_spool()
 
-    except Exception:
-        return "Unknown"
+    def _spill(self, rows):
+        with self._spool_lock:
+            with open(self._spool_path, "a", encoding="utf-8") as f:
+                for row in rows: f.write(json.dumps(row, default=str) + "\n")
 
-def log_action(user, action, target="", old_value=None, new_value=None):
-    conn = connect()
-    if conn is None: return
+    def _merge_leftover_replay(self):
+        # A replay interrupted by a crash leaves SPOOL_FILE.replay behind; fold it back into the spool
+        replay_path = self._spool_path + ".replay"
+        if not os.path.exists(replay_path): return
+        with open(replay_path, encoding="utf-8") as src, open(self._spool_path, "a", encoding="utf-8") as dst:
+            for line in src:
+                if line.strip(): dst.write(line if line.endswith("\n") else line + "\n")
+        os.remove(replay_path)
 
-    ip_address = get_client_ip()
+    def _replay_spool(self):
+        with self._spool_lock:
+            self._merge_leftover_replay()
+            if not os.path.exists(self._spool_path): return
+            replay_path = self._spool_path + ".replay"
+            os.replace(self._spool_path, replay_path)
+        rows = []
+        with open(replay_path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip(): continue
+                try: rows.append(json.loads(line))
+                except ValueError: print(f"Logging Error (spool line {n} unreadable, skipped): {line[:80]!r}")
+        sent = 0
+        try:
+            while sent < len(rows):
+                self._sink(rows[sent:sent + LOG_BATCH])
+                sent += LOG_BATCH
+        except Exception as e:
+            print(f"Logging Error (spool replay): {e}")
+            self._spill(rows[sent:])
+        os.remove(replay_path)
 
+@st.cache_resource
+def get_log_writer():
+    """One writer per process; batches are inserted through the shared repository."""
+    # Resolved here because the worker thread has no Streamlit script context
+    repo, cache = get_repository(), get_cache()
+    return AuditLogWriter(lambda rows: repo.insert("logs", rows), on_written=lambda: cache.invalidate("logs"))
+
+def build_log_row(user, action, target="", old_value=None, new_value=None):
     details = None
     if old_value or new_value:
         details = f"Changed from: [{old_value}] TO: [{new_value}]"
+    return {"user": user, "action": action, "target": target, "ip_address": get_client_ip(),
+            "details": details, "timestamp": datetime.now().isoformat()}
 
-    try:
-        cur = conn.cursor()
-        query = """
-            INSERT INTO logs ("user", action, target, ip_address, details) 
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cur.execute(query, (user, action, target, ip_address, details))
-        conn.commit()
-    except Exception as e:
-        print(f"Logging Error: {e}")
-    finally:
-        conn.close()
\ No newline at end of file
+def log_action(user, action, target="", old_value=None, new_value=None, writer=None):
+    """Queues an audit entry; the insert happens on the background writer thread."""
+    (writer or get_log_writer()).submit(build_log_row(user, action, target, old_value, new_value))
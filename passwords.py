@@ -0,0 +1,219 @@
+import base64
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import bcrypt
+import streamlit as st
+
+# --- ⚙️ CONFIGURATION ---
+DEFAULT_SCHEME = "scrypt"
+DEFAULT_TARGET_MS = 250   # how long one hash should take on this host
+HASH_WORKERS = min(8, os.cpu_count() or 2)
+HASH_MEMORY_MB = 256      # memory all concurrent bulk hashes may use together
+
+# --- 🔐 HASHER REGISTRY ---
+HASHERS = {}
+
+def register(cls):
+    HASHERS[cls.name] = cls()
+    return cls
+
+@register
+class ScryptHasher:
+    """Modern default: $scrypt$ln=<log2 N>,r=8,p=1$<salt>$<hash> (stdlib, memory-hard)."""
+    name = "scrypt"
+    min_cost, max_cost = 14, 17
+    r, p = 8, 1
+
+    def identify(self, stored):
+        return stored.startswith("$scrypt$")
+
+    def hash(self, password, cost):
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, cost)
+        b64 = lambda b: base64.b64encode(b).decode().rstrip("=")
+        return f"$scrypt$ln={cost},r={self.r},p={self.p}${b64(salt)}${b64(digest)}"
+
+    def verify(self, password, stored):
+        _, _, params, salt, digest = stored.split("$")
+        ln = int(dict(kv.split("=") for kv in params.split(","))["ln"])
+        unb64 = lambda s: base64.b64decode(s + "=" * (-len(s) % 4))
+        return hmac.compare_digest(self._derive(password, unb64(salt), ln), unb64(digest))
+
+    def cost_of(self, stored):
+        return int(stored.split("$")[2].split(",")[0].split("=")[1])
+
+    def memory(self, cost):
+        return 128 * self.r * (1 << cost)  # bytes: ln=17 needs 128 MiB per hash
+
+    def _derive(self, password, salt, ln):
+        n = 1 << ln
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=self.r, p=self.p,
+                              maxmem=256 * n * self.r, dklen=32)
+
+@register
+class BcryptHasher:
+    """Hashes written by the Streamlit app: $2b$<rounds>$..."""
+    name = "bcrypt"
+    min_cost, max_cost = 10, 16
+
+    def identify(self, stored):
+        return stored.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def hash(self, password, cost):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(cost)).decode()
+
+    def verify(self, password, stored):
+        return bcrypt.checkpw(password.encode(), stored.encode())
+
+    def cost_of(self, stored):
+        return int(stored[4:6])
+
+    def memory(self, cost):
+        return 0  # 4 KiB of state, whatever the rounds
+
+@register
+class Pbkdf2Hasher:
+    """Legacy auth.py format: 32 hex chars of salt + 64 hex chars of PBKDF2-SHA256 (100k iterations)."""
+    name = "pbkdf2_sha256"
+    iterations = 100000
+    min_cost = max_cost = iterations
+
+    def identify(self, stored):
+        if len(stored) != 96: return False
+        try: bytes.fromhex(stored)
+        except ValueError: return False
+        return True
+
+    def hash(self, password, cost):
+        salt = os.urandom(16)
+        return salt.hex() + hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations).hex()
+
+    def verify(self, password, stored):
+        salt, expected = bytes.fromhex(stored[:32]), bytes.fromhex(stored[32:])
+        return hmac.compare_digest(hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations), expected)
+
+    def cost_of(self, stored):
+        return self.iterations
+
+    def memory(self, cost):
+        return 0
+
+@register
+class PlaintextHasher:
+    """Rows created before hashing existed. Only ever verified, then upgraded on login."""
+    name = "plaintext"
+    min_cost = max_cost = 0
+
+    def identify(self, stored):
+        return True
+
+    def hash(self, password, cost):
+        raise ValueError("Refusing to store a plaintext password")
+
+    def verify(self, password, stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+
+    def cost_of(self, stored):
+        return 0
+
+    def memory(self, cost):
+        return 0
+
+def identify(stored):
+    # The plaintext hasher matches anything, so it is checked last
+    for hasher in HASHERS.values():
+        if hasher.name != "plaintext" and hasher.identify(stored): return hasher
+    return HASHERS["plaintext"]
+
+# --- COST POLICY ---
+
+def _auth_config():
+    try: return dict(st.secrets["auth"])
+    except Exception: return {}
+
+def calibrate(scheme, target_ms=DEFAULT_TARGET_MS):
+    """Benchmarks `scheme` at its minimum cost and extrapolates to the cost that takes ~target_ms.
+    Both bcrypt rounds and scrypt ln double the work per step."""
+    hasher = HASHERS[scheme]
+    start = time.perf_counter()
+    hasher.hash("calibration", hasher.min_cost)
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.01)
+    steps = math.floor(math.log2(target_ms / elapsed_ms)) if target_ms > elapsed_ms else 0
+    return max(hasher.min_cost, min(hasher.max_cost, hasher.min_cost + steps))
+
+@st.cache_resource
+def get_policy():
+    """(scheme, cost) used for new hashes. Set [auth] hash_scheme / hash_cost / hash_target_ms in secrets."""
+    cfg = _auth_config()
+    scheme = cfg.get("hash_scheme", DEFAULT_SCHEME)
+    if "hash_cost" in cfg: cost = int(cfg["hash_cost"])
+    elif scheme == "bcrypt" and "bcrypt_rounds" in cfg: cost = int(cfg["bcrypt_rounds"])
+    else: cost = calibrate(scheme, float(cfg.get("hash_target_ms", DEFAULT_TARGET_MS)))
+    return scheme, cost
+
+# --- METRICS ---
+_metrics_lock = threading.Lock()
+VERIFY_METRICS = {}  # scheme -> {"count", "total_ms", "max_ms"}
+
+def _record(scheme, elapsed_ms):
+    with _metrics_lock:
+        m = VERIFY_METRICS.setdefault(scheme, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        m["count"] += 1
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+
+def verify_stats():
+    with _metrics_lock:
+        return {s: dict(m, avg_ms=m["total_ms"] / m["count"]) for s, m in VERIFY_METRICS.items()}
+
+# --- PUBLIC API ---
+
+def hash_password(password):
+    scheme, cost = get_policy()
+    return HASHERS[scheme].hash(str(password), cost)
+
+def hash_workers():
+    """Threads for hash_passwords: up to HASH_WORKERS, but no more memory-hard hashes at once than
+    fit in [auth] hash_memory_mb (default HASH_MEMORY_MB), since each scrypt hash holds 16-128 MiB."""
+    scheme, cost = get_policy()
+    per_hash = HASHERS[scheme].memory(cost)
+    if not per_hash: return HASH_WORKERS
+    budget = float(_auth_config().get("hash_memory_mb", HASH_MEMORY_MB)) * 2**20
+    return max(1, min(HASH_WORKERS, int(budget // per_hash)))
+
+def hash_passwords(passwords, on_progress=None, workers=None):
+    """Hashes many passwords in a thread pool (bcrypt and hashlib release the GIL), keeping input order.
+    `workers` defaults to hash_workers()."""
+    workers = workers or hash_workers()
+    hashes = [None] * len(passwords)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(hash_password, pw): i for i, pw in enumerate(passwords)}
+        for done, future in enumerate(as_completed(futures), 1):
+            hashes[futures[future]] = future.result()
+            if on_progress: on_progress(done, len(passwords))
+    return hashes
+
+def needs_rehash(stored):
+    scheme, cost = get_policy()
+    hasher = identify(stored)
+    return hasher.name != scheme or hasher.cost_of(stored) < cost
+
+def verify_password(password, stored):
+    if not stored: return False
+    hasher = identify(stored)
+    start = time.perf_counter()
+    try: ok = hasher.verify(password, stored)
+    except Exception: ok = False
+    _record(hasher.name, (time.perf_counter() - start) * 1000)
+    return ok
+
+def verify_and_update(password, stored):
+    """Returns (ok, new_hash). new_hash is set when the login succeeded with an outdated hash
+    and the caller should store it."""
+    if not verify_password(password, stored): return False, None
+    return True, hash_password(password) if needs_rehash(stored) else None
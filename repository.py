@@ -0,0 +1,454 @@
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from psycopg2.extras import Json, execute_values
+from search import SEARCH_FIELDS
+
+# --- ⚙️ CONFIGURATION ---
+# Filter operators shared by every backend; filters are (operator, column, value) tuples
+SQL_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "like": "LIKE", "ilike": "ILIKE"}
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _ident(name):
+    # Table and column names are interpolated into SQL, so only plain identifiers get through
+    if not _IDENTIFIER.match(name): raise ValueError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+def _columns(columns):
+    return "*" if columns.strip() == "*" else ", ".join(_ident(c.strip()) for c in columns.split(","))
+
+# --- 🧩 INTERFACE ---
+
+class Repository:
+    """One data-access interface for every table (assets, hardware, staff, users, tickets, logs, ...).
+
+    Filters are (operator, column, value) tuples: eq, neq, gt, gte, lt, lte, like, ilike, in_.
+    `order_by` is a tuple of columns and `after` a keyset cursor holding their values from the
+    last row already seen. Rows go in and come out as plain dicts; failures raise.
+    """
+    name = "base"
+    supports_transactions = False
+
+    def select(self, table, columns="*", filters=(), order_by=(), desc=False, after=None, limit=None):
+        raise NotImplementedError
+
+    def count(self, table, filters=()):
+        raise NotImplementedError
+
+    def insert(self, table, rows):
+        raise NotImplementedError
+
+    def update(self, table, values, filters):
+        raise NotImplementedError
+
+    def delete(self, table, filters):
+        raise NotImplementedError
+
+    def rpc(self, name, params):
+        """Calls a database function (see fix_db.py); returns its rows, or its value for scalar functions."""
+        raise NotImplementedError
+
+    def transaction(self):
+        """Context manager: every call made on this repository inside the block (from the same thread)
+        commits or rolls back together. Only where `supports_transactions`; otherwise use an rpc."""
+        raise NotImplementedError(f"{self.name} cannot span a transaction across requests")
+
+    def get(self, table, row_id):
+        rows = self.select(table, filters=[("eq", "id", row_id)], limit=1)
+        return rows[0] if rows else None
+
+    def iter_pages(self, table, page_size=1000, after=None, order_by=("id",), **kwargs):
+        """Walks `table` in keyset pages of up to `page_size` rows. Only an empty page ends the walk,
+        because PostgREST silently caps large pages at its max-rows setting."""
+        while True:
+            rows = self.select(table, order_by=order_by, after=after, limit=page_size, **kwargs)
+            if not rows: return
+            yield rows
+            after = tuple(rows[-1][c] for c in order_by)
+
+# --- ☁️ SUPABASE (PostgREST) ---
+
+class SupabaseRepository(Repository):
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _filter(self, query, filters):
+        for op, col, val in filters: query = getattr(query, op)(col, _plain(val))
+        return query
+
+    def select(self, table, columns="*", filters=(), order_by=(), desc=False, after=None, limit=None):
+        query = self._filter(self.client.table(table).select(columns), filters)
+        for col in order_by: query = query.order(col, desc=desc)
+        if after is not None:
+            op = "lt" if desc else "gt"
+            if len(order_by) == 1:
+                query = getattr(query, op)(order_by[0], _plain(after[0]))
+            else:
+                (c1, c2), (v1, v2) = order_by, after
+                query = query.or_(f'{c1}.{op}."{v1}",and({c1}.eq."{v1}",{c2}.{op}.{v2})')
+        if limit: query = query.limit(limit)
+        return query.execute().data
+
+    def count(self, table, filters=()):
+        # count=exact + head=True: Postgres counts, no rows are transferred
+        return self._filter(self.client.table(table).select("*", count="exact", head=True), filters).execute().count or 0
+
+    def insert(self, table, rows):
+        if not rows: return []
+        return self.client.table(table).insert([_plain_row(r) for r in rows]).execute().data
+
+    def update(self, table, values, filters):
+        return self._filter(self.client.table(table).update(_plain_row(values)), filters).execute().data
+
+    def delete(self, table, filters):
+        return self._filter(self.client.table(table).delete(), filters).execute().data
+
+    def rpc(self, name, params):
+        return self.client.rpc(name, {k: _plain(v) for k, v in params.items()}).execute().data
+
+def _plain(value):
+    # PostgREST takes JSON, so dates travel as ISO strings
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def _plain_row(row):
+    return {k: _plain(v) for k, v in row.items()}
+
+# --- 🗄️ SQL BACKENDS ---
+
+class SqlRepository(Repository):
+    """SQL builder shared by the psycopg2 and SQLite backends. Subclasses supply `_execute`
+    and the dialect details (placeholder style, ILIKE, IN)."""
+    placeholder = "%s"
+    supports_transactions = True
+
+    def _operator(self, op):
+        return SQL_OPERATORS[op]
+
+    def _in(self, col, values, params):
+        params.append(list(values))  # a plain list: psycopg2 sends it as an array
+        return f"{col} = ANY({self.placeholder})"
+
+    def _where(self, filters, order_by=(), desc=False, after=None):
+        ph, clauses, params = self.placeholder, [], []
+        for op, col, val in filters:
+            if op == "in_":
+                clauses.append(self._in(_ident(col), val, params))
+            else:
+                clauses.append(f"{_ident(col)} {self._operator(op)} {ph}")
+                params.append(val)
+        if after is not None:
+            cmp = "<" if desc else ">"
+            if len(order_by) == 1:
+                clauses.append(f"{_ident(order_by[0])} {cmp} {ph}")
+                params.append(after[0])
+            else:
+                c1, c2 = map(_ident, order_by)
+                clauses.append(f"({c1} {cmp} {ph} OR ({c1} = {ph} AND {c2} {cmp} {ph}))")
+                params += [after[0], after[0], after[1]]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def select(self, table, columns="*", filters=(), order_by=(), desc=False, after=None, limit=None):
+        where, params = self._where(filters, order_by, desc, after)
+        sql = f"SELECT {_columns(columns)} FROM {_ident(table)}{where}"
+        if order_by: sql += " ORDER BY " + ", ".join(f"{_ident(c)} {'DESC' if desc else 'ASC'}" for c in order_by)
+        if limit: sql += f" LIMIT {int(limit)}"
+        return self._execute(sql, params)
+
+    def count(self, table, filters=()):
+        where, params = self._where(filters)
+        return self._execute(f"SELECT COUNT(*) AS n FROM {_ident(table)}{where}", params)[0]["n"]
+
+    def update(self, table, values, filters):
+        where, params = self._where(filters)
+        sets = ", ".join(f"{_ident(c)} = {self.placeholder}" for c in values)
+        return self._execute(f"UPDATE {_ident(table)} SET {sets}{where} RETURNING *", [*values.values(), *params])
+
+    def delete(self, table, filters):
+        where, params = self._where(filters)
+        return self._execute(f"DELETE FROM {_ident(table)}{where} RETURNING *", params)
+
+class PostgresRepository(SqlRepository):
+    """psycopg2 through the shared connection pool; `connect` is database.get_connection."""
+    name = "postgres"
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._local = threading.local()  # the open transaction's cursor, per thread
+
+    def _adapt(self, value):
+        return Json(value) if isinstance(value, (dict, list)) else value
+
+    @contextmanager
+    def transaction(self):
+        if getattr(self._local, "cur", None) is not None:
+            yield self  # nested: joins the outer transaction
+            return
+        with self._connect() as conn:
+            if conn is None: raise ConnectionError("database unavailable")
+            self._local.cur = conn.cursor()
+            try:
+                yield self
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self._local.cur.close()
+                self._local.cur = None
+
+    def _run(self, work):
+        cur = getattr(self._local, "cur", None)
+        if cur is not None: return work(cur)  # inside transaction(): commit happens at the end of the block
+        with self._connect() as conn:
+            if conn is None: raise ConnectionError("database unavailable")
+            with conn.cursor() as cur:
+                result = work(cur)
+            conn.commit()
+            return result
+
+    def _execute(self, sql, params):
+        def work(cur):
+            cur.execute(sql, params)
+            return _dict_rows(cur)
+        return self._run(work)
+
+    def insert(self, table, rows):
+        if not rows: return []
+        cols = list(dict.fromkeys(c for r in rows for c in r))
+        sql = f"INSERT INTO {_ident(table)} ({', '.join(map(_ident, cols))}) VALUES %s RETURNING *"
+        def work(cur):
+            execute_values(cur, sql, [tuple(self._adapt(r.get(c)) for c in cols) for r in rows], page_size=len(rows))
+            return _dict_rows(cur)
+        return self._run(work)
+
+    def update(self, table, values, filters):
+        return super().update(table, {k: self._adapt(v) for k, v in values.items()}, filters)
+
+    def rpc(self, name, params):
+        args = ", ".join(f"{_ident(k)} => %s" for k in params)
+        rows = self._execute(f"SELECT * FROM {_ident(name)}({args})", [self._adapt(v) for v in params.values()])
+        # Scalar functions come back as one row with a single column named after the function
+        if len(rows) == 1 and list(rows[0]) == [name]: return rows[0][name]
+        return rows
+
+def _dict_rows(cur):
+    if cur.description is None: return []
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+# --- 💾 SQLITE (OFFLINE STAND-IN) ---
+
+# Mirrors fix_db.COUNTED_TABLES: row counts kept in dashboard_counters by triggers
+_COUNTED = {"assets": "department", "hardware": "status"}
+_STATE_METRICS = "'hardware_by_status', 'assets_by_department'"
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f', 'now'))"
+
+def _counter_triggers():
+    sql = []
+    for t, c in _COUNTED.items():
+        upsert = "ON CONFLICT (metric, bucket) DO UPDATE SET value = value + excluded.value;"
+        sql.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_counters_insert AFTER INSERT ON {t} BEGIN
+                INSERT INTO dashboard_counters VALUES ('{t}', '', 1), ('{t}_by_{c}', coalesce(NEW.{c}, ''), 1) {upsert}
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_counters_delete AFTER DELETE ON {t} BEGIN
+                INSERT INTO dashboard_counters VALUES ('{t}', '', -1), ('{t}_by_{c}', coalesce(OLD.{c}, ''), -1) {upsert}
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_{t}_counters_update AFTER UPDATE OF {c} ON {t} WHEN OLD.{c} IS NOT NEW.{c} BEGIN
+                INSERT INTO dashboard_counters VALUES ('{t}_by_{c}', coalesce(OLD.{c}, ''), -1), ('{t}_by_{c}', coalesce(NEW.{c}, ''), 1) {upsert}
+            END;""")
+    return "".join(sql)
+
+SQLITE_SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS assets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        item_name TEXT, reference_no TEXT, expiry_date TEXT, category TEXT, department TEXT, supplier TEXT
+    );
+    CREATE TABLE IF NOT EXISTS staff (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        full_name TEXT, username TEXT, email TEXT, phone TEXT, gender TEXT, dob TEXT, department TEXT,
+        employee_number TEXT, doj TEXT, created_by TEXT
+    );
+    CREATE TABLE IF NOT EXISTS hardware (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        item_name TEXT, serial_no TEXT, model TEXT, status TEXT DEFAULT 'Available', asset_code TEXT,
+        capitalized_date TEXT, assigned_to_id INTEGER REFERENCES staff(id), assigned_date TEXT
+    );
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        username TEXT UNIQUE NOT NULL, password_hash TEXT, role TEXT DEFAULT 'user'
+    );
+    CREATE TABLE IF NOT EXISTS tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        subject TEXT, initial_message TEXT, created_by TEXT, status TEXT DEFAULT 'Open'
+    );
+    CREATE TABLE IF NOT EXISTS ticket_replies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT DEFAULT {_NOW},
+        ticket_id INTEGER REFERENCES tickets(id), sender TEXT, message TEXT
+    );
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, "timestamp" TEXT DEFAULT {_NOW},
+        "user" TEXT, action TEXT, target TEXT, ip_address TEXT, details TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs ("timestamp", id);
+    CREATE INDEX IF NOT EXISTS idx_assets_expiry_date ON assets (expiry_date);
+    CREATE VIEW IF NOT EXISTS hardware_master_report AS
+        SELECT h.id, s.employee_number, s.full_name, s.doj, s.department,
+               h.asset_code, h.serial_no, h.model, h.capitalized_date, h.assigned_to_id, h.assigned_date
+        FROM hardware h LEFT JOIN staff s ON s.id = h.assigned_to_id;
+    CREATE TABLE IF NOT EXISTS dashboard_counters (
+        metric TEXT NOT NULL, bucket TEXT NOT NULL DEFAULT '', value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, bucket)
+    );
+    CREATE TABLE IF NOT EXISTS daily_snapshots (
+        day TEXT NOT NULL, metric TEXT NOT NULL, bucket TEXT NOT NULL DEFAULT '', value INTEGER NOT NULL,
+        PRIMARY KEY (day, metric, bucket)
+    );
+    {_counter_triggers()}
+"""
+
+class SqliteRepository(SqlRepository):
+    """Local stand-in with the same tables, view, counters and functions (default: in memory),
+    for running the app offline and for benchmarking the shared code path."""
+    name = "sqlite"
+    placeholder = "?"
+
+    def __init__(self, path=":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()  # one connection shared by the script and worker threads
+        self._depth = 0                 # transaction() nesting, only touched while holding the lock
+        with self._lock: self._conn.executescript(SQLITE_SCHEMA)
+
+    def _adapt(self, value):
+        if isinstance(value, (date, datetime)): return value.isoformat()
+        if isinstance(value, (dict, list)): return json.dumps(value)
+        return value
+
+    def _operator(self, op):
+        return "LIKE" if op == "ilike" else SQL_OPERATORS[op]  # SQLite's LIKE is already case-insensitive
+
+    def _in(self, col, values, params):
+        values = list(values)
+        params.extend(values)
+        return f"{col} IN ({', '.join('?' * len(values))})"
+
+    @contextmanager
+    def transaction(self):
+        # Holding the lock for the whole block keeps other threads' statements out of it
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+                if self._depth == 1: self._conn.commit()
+            except Exception:
+                if self._depth == 1: self._conn.rollback()
+                raise
+            finally:
+                self._depth -= 1
+
+    def _transaction(self, work):
+        with self._lock:
+            if self._depth: return work(self._conn)  # inside transaction(): commit happens at the end of the block
+            try:
+                result = work(self._conn)
+                self._conn.commit()
+                return result
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def _execute(self, sql, params):
+        params = [self._adapt(p) for p in params]
+        return self._transaction(lambda conn: [dict(r) for r in conn.execute(sql, params).fetchall()])
+
+    def insert(self, table, rows):
+        if not rows: return []
+        def work(conn):
+            inserted = []
+            for row in rows:
+                cols = ", ".join(map(_ident, row))
+                sql = f"INSERT INTO {_ident(table)} ({cols}) VALUES ({', '.join('?' * len(row))}) RETURNING *"
+                inserted.append(dict(conn.execute(sql, [self._adapt(v) for v in row.values()]).fetchone()))
+            return inserted
+        return self._transaction(work)
+
+    def rpc(self, name, params):
+        if name.startswith("search_"): return self._search(name[len("search_"):], **params)
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None: raise NotImplementedError(f"{name}() has no SQLite stand-in")
+        return self._transaction(lambda conn: handler(conn, **params))
+
+    # Python versions of the Postgres functions created by fix_db.py
+
+    def _rpc_assign_hardware(self, conn, p_pairs, p_user, p_ip=None):
+        assigned, conflicts, seen = [], set(), set()
+        for pair in p_pairs:
+            hw_id, staff_id = pair["hardware_id"], pair["staff_id"]
+            if hw_id in seen:  # listed twice: the first row wins, the later ones are conflicts
+                conflicts.add(hw_id)
+                continue
+            seen.add(hw_id)
+            cur = conn.execute("UPDATE hardware SET status = 'Assigned', assigned_to_id = ?, assigned_date = date('now') "
+                               "WHERE id = ? AND status = 'Available'", (staff_id, hw_id))
+            if not cur.rowcount:
+                conflicts.add(hw_id)
+                continue
+            assigned.append({"hardware_id": hw_id, "staff_id": staff_id})
+            conn.execute('INSERT INTO logs ("user", action, target, ip_address) VALUES (?, ?, ?, ?)',
+                         (p_user, "Assign Asset", f"HW {hw_id} -> Staff {staff_id}", p_ip))
+        return {"assigned": assigned, "conflicts": sorted(conflicts)}
+
+    def _rpc_delete_staff(self, conn, p_staff_ids):
+        marks = ", ".join("?" * len(p_staff_ids))
+        conn.execute(f"UPDATE hardware SET assigned_to_id = NULL, status = 'Available' WHERE assigned_to_id IN ({marks})", p_staff_ids)
+        return [dict(r) for r in conn.execute(f"DELETE FROM staff WHERE id IN ({marks}) RETURNING id", p_staff_ids)]
+
+    def _rpc_reconcile_dashboard_counters(self, conn):
+        actual = {}
+        for t, c in _COUNTED.items():
+            actual[(t, "")] = conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for bucket, n in conn.execute(f"SELECT coalesce({c}, ''), COUNT(*) FROM {t} GROUP BY 1"):
+                actual[(f"{t}_by_{c}", bucket)] = n
+        current = {(m, b): v for m, b, v in conn.execute("SELECT metric, bucket, value FROM dashboard_counters")}
+        drift = sum(current.get(k) != v for k, v in actual.items()) + len(current.keys() - actual.keys())
+        conn.execute("DELETE FROM dashboard_counters")
+        conn.executemany("INSERT INTO dashboard_counters VALUES (?, ?, ?)", [(*k, v) for k, v in actual.items()])
+        return drift
+
+    def _rpc_take_daily_snapshot(self, conn, from_day, to_day=None):
+        from_day, to_day = str(from_day), str(to_day or date.today())
+        today = str(date.today())
+        if from_day <= today <= to_day:
+            conn.execute(f"DELETE FROM daily_snapshots WHERE day = ? AND metric IN ({_STATE_METRICS})", (today,))
+        cur = conn.execute(f"""
+            INSERT INTO daily_snapshots (day, metric, bucket, value)
+            SELECT substr("timestamp", 1, 10), 'actions', coalesce(action, ''), COUNT(*) FROM logs
+            WHERE "timestamp" >= :from AND "timestamp" < date(:to, '+1 day') GROUP BY 1, 3
+            UNION ALL
+            SELECT substr("timestamp", 1, 10), 'logins', '', COUNT(*) FROM logs
+            WHERE action = 'Login' AND "timestamp" >= :from AND "timestamp" < date(:to, '+1 day') GROUP BY 1
+            UNION ALL
+            SELECT :today, metric, bucket, value FROM dashboard_counters
+            WHERE metric IN ({_STATE_METRICS}) AND value <> 0 AND :today BETWEEN :from AND :to
+            ON CONFLICT (day, metric, bucket) DO UPDATE SET value = max(value, excluded.value)
+        """, {"from": from_day, "to": to_day, "today": today})
+        return cur.rowcount
+
+    def _search(self, table, q, lim=50):
+        """LIKE-based stand-in for search_<table>(): substring hits score 0.5, prefix hits 1.5
+        (there is no trigram similarity offline). `q` arrives LIKE-escaped from search.py."""
+        doc = "lower(" + " || ' ' || ".join(f"coalesce({_ident(c)}, '')" for c in SEARCH_FIELDS[table]) + ")"
+        sql = f"""
+            SELECT CASE WHEN {doc} LIKE :q || '%' ESCAPE '\\' OR {doc} LIKE '% ' || :q || '%' ESCAPE '\\'
+                        THEN 1.5 ELSE 0.5 END AS _score, *
+            FROM {_ident(table)} WHERE {doc} LIKE '%' || :q || '%' ESCAPE '\\'
+            ORDER BY _score DESC LIMIT :lim
+        """
+        with self._lock: rows = [dict(r) for r in self._conn.execute(sql, {"q": q.lower(), "lim": lim})]
+        return [{"score": r.pop("_score"), "row_data": r} for r in rows]
@@ -0,0 +1,118 @@
+import glob
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+import pandas as pd
+import streamlit as st
+from cache import invalidate
+from database import get_repository
+
+# --- ⚙️ CONFIGURATION ---
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_archive")
+DEFAULT_RETENTION_DAYS = 180
+ARCHIVE_BATCH = 5000
+DELETE_CHUNK = 200        # ids per DELETE ... IN (...) request
+MAX_ARCHIVE_ROWS = 50000  # cap on rows returned by one archive query
+
+def get_retention_days():
+    try: return int(st.secrets["logging"]["retention_days"])
+    except Exception: return DEFAULT_RETENTION_DAYS
+
+def _part_path(month, first_id):
+    return os.path.join(ARCHIVE_DIR, f"logs-{month}-{first_id}.jsonl.gz")
+
+def _month_files(month):
+    # logs-YYYY-MM.jsonl.gz is the single appended file older versions wrote
+    return sorted(glob.glob(os.path.join(ARCHIVE_DIR, f"logs-{month}.jsonl.gz"))
+                  + glob.glob(os.path.join(ARCHIVE_DIR, f"logs-{month}-*.jsonl.gz")))
+
+def _month_of(ts):
+    return str(ts)[:7]  # "YYYY-MM" from a datetime or ISO string
+
+# --- 🗄️ ARCHIVAL JOB ---
+
+def archive_logs(older_than_days=None, batch=ARCHIVE_BATCH, on_progress=None):
+    """Moves log rows older than the retention window into gzip JSONL part files, one per batch
+    and month (log_archive/logs-YYYY-MM-<first id>.jsonl.gz).
+
+    Each part is written to a temp file and renamed into place before its rows are deleted, so a
+    crash leaves either a complete part or none and can never lose rows. A batch archived but not
+    deleted by an earlier run gets the same part name and is overwritten; overlapping parts from a
+    changed batch size are de-duplicated by id in query_archive. Returns the number of rows
+    archived. Any database error stops the job and is re-raised once the rows moved so far are
+    accounted for; PermissionError if the database accepts a DELETE but removes fewer rows than
+    were archived.
+    """
+    days = older_than_days if older_than_days is not None else get_retention_days()
+    cutoff = datetime.combine(date.today() - timedelta(days=days), datetime.min.time())
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    repo, moved, failure = get_repository(), 0, None
+    while True:
+        try:
+            rows = repo.select("logs", filters=[("lt", "timestamp", cutoff)], order_by=("timestamp", "id"), limit=batch)
+            if not rows: break
+            by_month = {}
+            for row in rows: by_month.setdefault(_month_of(row["timestamp"]), []).append(row)
+            for month, month_rows in by_month.items(): _write_part(month, month_rows)
+            ids, removed = [row["id"] for row in rows], 0
+            for start in range(0, len(ids), DELETE_CHUNK):
+                removed += len(repo.delete("logs", [("in_", "id", ids[start:start + DELETE_CHUNK])]))
+            # PostgREST reports a DELETE blocked by RLS / missing grants as success with no rows;
+            # looping on would re-select (and re-archive) the same batch forever
+            if removed < len(ids):
+                moved += removed
+                failure = PermissionError(f"deleted {removed} of {len(ids)} archived rows; check delete rights on logs")
+                break
+        except Exception as e:
+            print(f"Archive Error: {e}")
+            failure = e
+            break
+        moved += len(rows)
+        if on_progress: on_progress(moved)
+    if moved: invalidate("logs", "log_history")
+    if failure: raise failure
+    return moved
+
+def _write_part(month, rows):
+    path = _part_path(month, rows[0]["id"])
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for row in rows: f.write(json.dumps(row, default=str) + "\n")
+    os.replace(tmp, path)  # atomic, so a part is either complete or absent
+
+def _read_archive(path):
+    """Rows of one archive file. Skips broken lines and stops at a truncated gzip member,
+    which only the single appended file written by older versions can contain."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try: row = json.loads(line)
+                except ValueError: continue
+                if isinstance(row, dict): yield row
+    except (EOFError, OSError) as e:
+        print(f"Archive Read Error ({os.path.basename(path)}): {e}")
+
+# --- 🔎 ARCHIVE QUERIES ---
+
+def archived_months():
+    if not os.path.isdir(ARCHIVE_DIR): return []
+    return sorted({f[5:12] for f in os.listdir(ARCHIVE_DIR) if f.startswith("logs-") and f.endswith(".jsonl.gz")}, reverse=True)
+
+def query_archive(start_d, end_d, user=None, action=None, target=None, limit=MAX_ARCHIVE_ROWS):
+    """Reads only the monthly files overlapping [start_d, end_d] and filters line by line."""
+    start, end = str(start_d), str(end_d + timedelta(days=1))
+    months = [m for m in archived_months() if start[:7] <= m <= str(end_d)[:7]]
+    paths = [path for month in sorted(months) for path in _month_files(month)]
+    seen, rows = set(), []
+    for row in (row for path in paths for row in _read_archive(path)):
+        ts = str(row.get("timestamp", ""))
+        if not (start <= ts < end) or row.get("id") in seen: continue
+        if user and row.get("user") != user: continue
+        if action and not str(row.get("action", "")).lower().startswith(action.lower()): continue
+        if target and target.lower() not in str(row.get("target", "")).lower(): continue
+        seen.add(row.get("id"))
+        rows.append(row)
+        if len(rows) >= limit: break
+    df = pd.DataFrame(rows)
+    return df.sort_values("timestamp", ascending=False) if not df.empty else df
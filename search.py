@@ -0,0 +1,110 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import pandas as pd
+from cache import get_cache
+
+# --- ⚙️ CONFIGURATION ---
+MIN_QUERY_LEN = 2
+DEFAULT_LIMIT = 50
+GLOBAL_LIMIT = 10       # hits per entity in the global search
+GLOBAL_BUDGET = 1.5     # seconds; slower entities are reported as timed out
+SEARCH_WORKERS = 8      # threads shared by every session's global search
+
+# Text columns folded into each table's search document (order = display priority)
+SEARCH_FIELDS = {
+    "assets": ["item_name", "reference_no", "supplier", "category", "department"],
+    "hardware": ["serial_no", "asset_code", "item_name", "model"],
+    "staff": ["full_name", "employee_number", "email", "department"],
+    "tickets": ["subject", "created_by", "initial_message"],
+}
+
+# (title column, subtitle column) for global search results
+DISPLAY_FIELDS = {
+    "assets": ("item_name", "reference_no"),
+    "hardware": ("item_name", "serial_no"),
+    "staff": ("full_name", "employee_number"),
+    "tickets": ("subject", "created_by"),
+}
+
+# --- 🗂️ SCHEMA (used by fix_db.py) ---
+
+def search_document(table):
+    """SQL expression that is both indexed and searched; the two must match exactly
+    for Postgres to use the trigram index."""
+    parts = " || ' ' || ".join(f"coalesce({col}::text, '')" for col in SEARCH_FIELDS[table])
+    return f"lower({parts})"
+
+def search_migrations():
+    """(label, sql) steps: a trigram GIN index plus a ranked search_<table>(q, lim) function per table.
+    Score = word similarity, +1 when the query is a prefix of the document or of any word in it.
+    The functions give up after GLOBAL_BUDGET, so a search nobody waits for stops using the database."""
+    steps = []  # pg_trgm itself is enabled earlier in fix_db.MIGRATIONS
+    for table in SEARCH_FIELDS:
+        doc = search_document(table)
+        steps.append((f"Indexing {table} for search (trigram)",
+                      f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table}_search_trgm ON {table} USING gin (({doc}) gin_trgm_ops);"))
+        steps.append((f"Creating search_{table}() function", f"""
+            CREATE OR REPLACE FUNCTION search_{table}(q text, lim int DEFAULT {DEFAULT_LIMIT})
+            RETURNS TABLE (score real, row_data jsonb)
+            LANGUAGE sql STABLE
+            SET statement_timeout = '{int(GLOBAL_BUDGET * 1000)}ms'
+            AS $$
+                SELECT (word_similarity(lower(q), {doc})
+                        + CASE WHEN {doc} LIKE lower(q) || '%' OR {doc} LIKE '% ' || lower(q) || '%' THEN 1 ELSE 0 END)::real AS score,
+                       to_jsonb({table}) AS row_data
+                FROM {table}
+                WHERE {doc} LIKE '%' || lower(q) || '%' OR lower(q) <% {doc}
+                ORDER BY score DESC
+                LIMIT lim
+            $$;
+        """))
+    return steps
+
+# --- 🔎 QUERIES ---
+
+def _escape_like(query):
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_table(repo, table, query, limit=DEFAULT_LIMIT, cache=None):
+    """Ranked, prefix-aware search over one table, evaluated by the search_<table>() function.
+    Results are cached per table and dropped whenever that table is written to.
+    Pass `cache` when calling from a worker thread (it has no Streamlit script context)."""
+    query = (query or "").strip()
+    if len(query) < MIN_QUERY_LEN: return pd.DataFrame()
+    load = lambda: repo.rpc(f"search_{table}", {"q": _escape_like(query), "lim": limit})
+    hits = (cache or get_cache()).get((table,), ("search", table, query.lower(), limit), load)
+    if not hits: return pd.DataFrame()
+    df = pd.DataFrame([h["row_data"] for h in hits])
+    df.insert(0, "_score", [round(h["score"], 3) for h in hits])
+    return df
+
+_pool, _pool_lock = None, threading.Lock()
+
+def _executor():
+    """One bounded pool for all global searches; queries beyond SEARCH_WORKERS queue instead of adding threads."""
+    global _pool
+    with _pool_lock:
+        if _pool is None: _pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="global-search")
+        return _pool
+
+def global_search(repo, query, tables=tuple(SEARCH_FIELDS), limit=GLOBAL_LIMIT, budget=GLOBAL_BUDGET):
+    """Searches every entity concurrently and merges the hits by score.
+    Returns (hits, timed_out): entities that miss the latency budget are skipped, not awaited."""
+    cache = get_cache()
+    pool = _executor()
+    futures = {pool.submit(search_table, repo, t, query, limit, cache): t for t in tables}
+    done, pending = wait(futures, timeout=budget)
+    for future in pending: future.cancel()  # still queued: never start it
+    hits = []
+    for future in done:
+        table = futures[future]
+        try: df = future.result()
+        except Exception as e:
+            print(f"Search Error ({table}): {e}")
+            continue
+        title_col, sub_col = DISPLAY_FIELDS[table]
+        for row in df.to_dict("records"):
+            hits.append({"entity": table, "score": row["_score"], "id": row.get("id"),
+                         "title": row.get(title_col) or "", "detail": row.get(sub_col) or ""})
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    return hits, sorted(futures[f] for f in pending)
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+import pandas as pd
+from cache import cached, invalidate
+from database import get_repository
+
+# --- ⚙️ CONFIGURATION ---
+SNAPSHOT_INTERVAL = 3600  # seconds; today's row is refreshed at most this often per process
+SNAPSHOT_LOOKBACK = 90    # days; how far back a catch-up run reaches when snapshots have fallen behind
+STATE_METRICS = ("hardware_by_status", "assets_by_department")  # copied from dashboard_counters
+LOG_METRICS = ("logins", "actions")                             # aggregated from logs by day
+
+# --- 🗂️ SCHEMA (used by fix_db.py) ---
+
+def snapshot_migrations():
+    """(label, sql) steps for daily_snapshots: one row per (day, metric, bucket)."""
+    state = ", ".join(f"'{m}'" for m in STATE_METRICS)
+    return [
+        ("Creating daily_snapshots table", """
+            CREATE TABLE IF NOT EXISTS daily_snapshots (
+                day DATE NOT NULL,
+                metric TEXT NOT NULL,
+                bucket TEXT NOT NULL DEFAULT '',
+                value BIGINT NOT NULL,
+                PRIMARY KEY (day, metric, bucket)
+            );
+        """),
+        ("Creating take_daily_snapshot() function", f"""
+            CREATE OR REPLACE FUNCTION take_daily_snapshot(from_day date, to_day date DEFAULT current_date)
+            RETURNS integer LANGUAGE plpgsql AS $$
+            DECLARE
+                n integer;
+            BEGIN
+                -- Inventory state can only be observed now; replace today's rows so vanished buckets drop out
+                IF current_date BETWEEN from_day AND to_day THEN
+                    DELETE FROM daily_snapshots WHERE day = current_date AND metric IN ({state});
+                END IF;
+                INSERT INTO daily_snapshots (day, metric, bucket, value)
+                SELECT "timestamp"::date, 'actions', coalesce(action, ''), count(*) FROM logs
+                WHERE "timestamp" >= from_day AND "timestamp" < to_day + 1 GROUP BY 1, 3
+                UNION ALL
+                SELECT "timestamp"::date, 'logins', '', count(*) FROM logs
+                WHERE action = 'Login' AND "timestamp" >= from_day AND "timestamp" < to_day + 1 GROUP BY 1
+                UNION ALL
+                SELECT current_date, metric, bucket, value FROM dashboard_counters
+                WHERE metric IN ({state}) AND value <> 0 AND current_date BETWEEN from_day AND to_day
+                -- Log counts only grow within a day; GREATEST keeps history intact once old logs are archived
+                ON CONFLICT (day, metric, bucket) DO UPDATE SET value = GREATEST(daily_snapshots.value, EXCLUDED.value);
+                GET DIAGNOSTICS n = ROW_COUNT;
+                RETURN n;
+            END $$;
+        """),
+        ("Backfilling daily_snapshots from logs",
+         'SELECT take_daily_snapshot(coalesce((SELECT min("timestamp")::date FROM logs), current_date));'),
+    ]
+
+# --- 📸 SNAPSHOT JOB ---
+
+def take_snapshot(from_day=None, to_day=None):
+    """Aggregates logs for [from_day, to_day] and records today's inventory state.
+    Defaults to catching up from the last aggregated day (at most SNAPSHOT_LOOKBACK days back)
+    to today, so days on which nobody opened the dashboard are filled in too. None on error."""
+    try: return _run_snapshot(from_day, to_day)
+    except Exception as e:
+        print(f"Snapshot Error: {e}")
+        return None
+
+def ensure_snapshots():
+    """Runs the snapshot job at most once per SNAPSHOT_INTERVAL per process (called on dashboard load).
+    A failed run is not cached, so the next load tries again."""
+    try: return cached(("snapshot_job",), ("snapshot_job", str(date.today())), _run_snapshot, ttl=SNAPSHOT_INTERVAL)
+    except Exception as e:
+        print(f"Snapshot Error: {e}")
+        return None
+
+def _run_snapshot(from_day=None, to_day=None):
+    to_day = to_day or date.today()
+    from_day = from_day or _catch_up_from(to_day)
+    rows = get_repository().rpc("take_daily_snapshot", {"from_day": from_day, "to_day": to_day})
+    invalidate("daily_snapshots")
+    return rows
+
+def _catch_up_from(to_day):
+    # Re-aggregating the last stored day is harmless (counts merge with GREATEST) and finalises it;
+    # yesterday is always included because its last logs may have landed after the previous run
+    floor = to_day - timedelta(days=SNAPSHOT_LOOKBACK)
+    rows = get_repository().select("daily_snapshots", "day", order_by=("day",), desc=True, limit=1)
+    last = date.fromisoformat(str(rows[0]["day"])[:10]) if rows else floor
+    return max(floor, min(last, to_day - timedelta(days=1)))
+
+# --- 📈 SERIES ---
+
+def get_series(metric, start_d, end_d):
+    """Day-indexed DataFrame (one column per bucket) for `metric` over [start_d, end_d].
+    Reads only the pre-aggregated daily_snapshots rows, never the base tables."""
+    def load():
+        filters = [("eq", "metric", metric), ("gte", "day", start_d), ("lte", "day", end_d)]
+        try: rows = [r for page in get_repository().iter_pages("daily_snapshots", columns="day, bucket, value", filters=filters,
+                                                               order_by=("day", "bucket")) for r in page]
+        except Exception: return pd.DataFrame()
+        if not rows: return pd.DataFrame()
+        df = pd.DataFrame(rows, columns=["day", "bucket", "value"])
+        df["day"] = pd.to_datetime(df["day"]).dt.date  # ISO strings from PostgREST / SQLite
+        series = df.pivot_table(index="day", columns="bucket", values="value", aggfunc="sum")
+        series = series.rename(columns={"": metric}).rename_axis(columns=None)
+        if metric in LOG_METRICS:  # no log rows on a day means zero, not unknown
+            series = series.reindex(pd.date_range(start_d, end_d).date, fill_value=0).fillna(0)
+        return series
+    return cached("daily_snapshots", ("series", metric, str(start_d), str(end_d)), load)
@@ -0,0 +1,15 @@
+import pytest
+from cache import get_cache
+from repository import SqliteRepository
+
+@pytest.fixture
+def sqlite_repo(monkeypatch):
+    """Factory: sqlite_repo(module, ...) returns a fresh in-memory SqliteRepository and makes it the
+    `get_repository()` of every module given. The shared table cache is cleared around each test."""
+    def make(*modules):
+        repo = SqliteRepository()
+        for module in modules: monkeypatch.setattr(module, "get_repository", lambda: repo)
+        return repo
+    get_cache().clear()
+    yield make
+    get_cache().clear()
@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+import pytest
+import alerts
+import database
+from cache import get_cache
+
+@pytest.fixture
+def repo(sqlite_repo, monkeypatch, tmp_path):
+    monkeypatch.setattr(alerts, "OUTBOX_DIR", str(tmp_path))
+    monkeypatch.setattr(alerts, "get_window_days", lambda: 30)
+    return sqlite_repo(alerts, database)
+
+def soon(days):
+    return str(date.today() + timedelta(days=days))
+
+def test_asset_write_refreshes_todays_digest(repo):
+    repo.insert("assets", [{"item_name": "VPN", "expiry_date": soon(5)}])
+    assert len(alerts.get_daily_digest()["items"]) == 1
+    database.add_asset("CRM", "R-1", soon(10), "Software", "IT", "Acme")
+    digest = alerts.get_daily_digest()
+    assert [i["item_name"] for i in digest["items"]] == ["VPN", "CRM"]
+    assert alerts.load_digest()["items"] == digest["items"]  # outbox file rewritten too
+
+def test_unreachable_database_serves_todays_file(repo, monkeypatch):
+    repo.insert("assets", [{"item_name": "VPN", "expiry_date": soon(5)}])
+    alerts.get_daily_digest()
+    get_cache().clear()
+    monkeypatch.setattr(alerts, "build_digest", lambda today=None, days=None: None)
+    assert len(alerts.get_daily_digest(force=True)["items"]) == 1
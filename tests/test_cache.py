@@ -0,0 +1,17 @@
+from cache import TableCache
+
+def test_write_during_load_is_not_cached():
+    cache = TableCache()
+    def loader():
+        cache.invalidate("assets")  # a write finishing while the read is in flight
+        return "stale"
+    assert cache.get(("assets",), "k", loader) == "stale"
+    assert cache.get(("assets",), "k", lambda: "fresh") == "fresh"
+
+def test_unrelated_write_still_caches():
+    cache = TableCache()
+    def loader():
+        cache.invalidate("logs")
+        return 1
+    cache.get(("assets",), "k", loader)
+    assert cache.get(("assets",), "k", lambda: 2) == 1
@@ -0,0 +1,45 @@
+import pytest
+import database
+
+@pytest.fixture
+def repo(sqlite_repo):
+    return sqlite_repo(database)
+
+def test_delete_rows_chunks_and_writes_one_audit_entry(repo):
+    ids = [r["id"] for r in repo.insert("assets", [{"item_name": f"A{i}"} for i in range(5)])]
+    progress = []
+    results = database.delete_rows("assets", ids[:4], "admin", "10.0.0.1", chunk_size=2,
+                                   on_progress=lambda done, total: progress.append(done))
+    assert [r["deleted"] for r in results] == [ids[:2], ids[2:4]]
+    assert progress == [2, 4]
+    assert [r["id"] for r in repo.select("assets")] == [ids[4]]
+    log = repo.select("logs")
+    assert len(log) == 1 and log[0]["action"] == "Bulk Delete" and log[0]["ip_address"] == "10.0.0.1"
+
+def test_delete_rows_rolls_back_every_chunk_on_failure(repo, monkeypatch):
+    ids = [r["id"] for r in repo.insert("assets", [{"item_name": f"A{i}"} for i in range(4)])]
+    real_delete, calls = repo.delete, []
+    def flaky(table, filters):
+        calls.append(filters)
+        if len(calls) == 2: raise RuntimeError("timeout")
+        return real_delete(table, filters)
+    monkeypatch.setattr(repo, "delete", flaky)
+    results = database.delete_rows("assets", ids, "admin", chunk_size=2)
+    assert results[0]["error"].startswith("rolled back") and not results[0]["deleted"]
+    assert repo.count("assets") == 4 and repo.count("logs") == 0
+
+def test_deleting_staff_releases_their_hardware(repo):
+    staff = [s["id"] for s in repo.insert("staff", [{"full_name": "A"}, {"full_name": "B"}])]
+    hw = [h["id"] for h in repo.insert("hardware", [{"item_name": "L", "status": "Assigned", "assigned_to_id": staff[0]},
+                                                    {"item_name": "M", "status": "Assigned", "assigned_to_id": staff[1]}])]
+    database.delete_rows("staff", [staff[0]])
+    assert repo.get("hardware", hw[0])["status"] == "Available" and repo.get("hardware", hw[0])["assigned_to_id"] is None
+    assert repo.get("hardware", hw[1])["assigned_to_id"] == staff[1]
+
+def test_staff_rpc_used_where_transactions_are_unavailable(repo, monkeypatch):
+    staff = repo.insert("staff", [{"full_name": "A"}])[0]["id"]
+    hw = repo.insert("hardware", [{"item_name": "L", "status": "Assigned", "assigned_to_id": staff}])[0]["id"]
+    monkeypatch.setattr(repo, "supports_transactions", False)
+    results = database.delete_rows("staff", [staff])
+    assert results[0]["deleted"] == [staff]
+    assert repo.get("hardware", hw)["status"] == "Available" and repo.count("staff") == 0
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+import exports
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+def test_parquet_column_null_in_first_chunk_then_typed(tmp_path):
+    pages = [
+        pd.DataFrame({"id": [1, 2], "assigned_to_id": [None, None], "score": [1.5, None]}),
+        pd.DataFrame({"id": [3, 4], "assigned_to_id": [7, None], "score": [None, 2]}),
+    ]
+    path = exports.write_export(iter(pages), "Parquet")
+    try:
+        table = pq.read_table(path)
+        assert table.num_rows == 4
+        assert table.column("assigned_to_id").to_pylist() == [None, None, 7, None]
+        assert table.column("id").to_pylist() == [1, 2, 3, 4]
+        assert table.column("score").to_pylist() == ["1.5", None, None, "2"]  # unknown type: text
+    finally:
+        exports.os.remove(path)
+
+def test_parquet_missing_column_in_later_chunk(tmp_path):
+    pages = [pd.DataFrame({"a": [1], "b": ["x"]}), pd.DataFrame({"a": [2]})]
+    path = exports.write_export(iter(pages), "Parquet")
+    try:
+        assert pq.read_table(path).column("b").to_pylist() == ["x", None]
+    finally:
+        exports.os.remove(path)
+
+def test_parquet_keeps_date_and_timestamp_types_under_rename(tmp_path):
+    pages = [
+        pd.DataFrame({"doj": [None], "assigned_date": ["2024-03-01"], "created_at": ["2024-03-01T10:00:00+00:00"]}),
+        pd.DataFrame({"doj": ["2023-07-15"], "assigned_date": [None], "created_at": ["2024-03-02T09:30:00"]}),
+    ]
+    path = exports.write_export(iter(pages), "Parquet", rename={"doj": "DOJ", "assigned_date": "assigned_date",
+                                                                "created_at": "Created"})
+    try:
+        table = pq.read_table(path)
+        assert table.column_names == ["DOJ", "assigned_date", "Created"]
+        assert table.column("DOJ").to_pylist() == [None, exports.pd.Timestamp("2023-07-15").date()]
+        assert str(table.schema.field("assigned_date").type) == "date32[day]"
+        assert table.column("Created").to_pylist()[1].hour == 9
+    finally:
+        exports.os.remove(path)
+
+def test_read_export_returns_bytes_and_deletes_file():
+    path = exports.write_export(iter([pd.DataFrame({"a": [1, 2]})]), "CSV")
+    assert exports.read_export(path) == b"a\n1\n2\n"
+    assert not exports.os.path.exists(path)
+    assert exports.read_export(path) == b""
+
+def test_purge_removes_only_stale_exports():
+    stale = exports.write_export(iter([pd.DataFrame({"a": [1]})]), "CSV")
+    old = exports.time.time() - exports.EXPORT_TTL - 60
+    exports.os.utime(stale, (old, old))
+    fresh = exports.write_export(iter([pd.DataFrame({"a": [2]})]), "CSV")  # sweeps on the way in
+    try:
+        assert not exports.os.path.exists(stale)
+        assert exports.os.path.exists(fresh)
+    finally:
+        exports.remove_export(fresh)
@@ -0,0 +1,81 @@
+import io
+import importer
+
+class IntegrityError(Exception):
+    """Stands in for the driver's constraint-violation error."""
+
+def csv(*lines):
+    return io.StringIO("\n".join(lines) + "\n")
+
+def test_rows_are_read_in_chunks_and_inserted_in_batches(monkeypatch):
+    monkeypatch.setattr(importer, "CHUNK_ROWS", 3)
+    monkeypatch.setattr(importer, "INSERT_BATCH", 4)
+    batches, progress = [], []
+    rows = [f"Laptop {i},SN{i}" for i in range(10)]
+    report = importer.import_csv(csv("item_name,serial_no", *rows), "hardware", batches.append,
+                                 on_progress=lambda ins, rej: progress.append(ins))
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert batches[0][0] == {"item_name": "Laptop 0", "serial_no": "SN0", "status": "Available"}
+    assert report["inserted"] == 10 and report["rejected"] == 0
+    assert len(progress) == 5  # one per chunk plus the final flush
+
+def test_rejected_counts_rows_not_errors():
+    report = importer.import_csv(csv("item_name,expiry_date,category",
+                                     "A,2024-01-01,Software",
+                                     "B,not a date,Hardware",   # two bad fields, one row
+                                     ",2024-01-01,Software"),   # missing item_name
+                                 "assets", lambda batch: None)
+    assert report["inserted"] == 1
+    assert report["rejected"] == 2
+    assert len(report["errors"]) == 3
+    assert report["errors"]["row"].tolist() == [3, 3, 4]
+
+def test_error_report_is_capped_but_count_keeps_going(monkeypatch):
+    monkeypatch.setattr(importer, "MAX_ERRORS", 5)
+    rows = [f"Item {i},bad date" for i in range(20)]
+    report = importer.import_csv(csv("item_name,expiry_date", *rows), "assets", lambda batch: None)
+    assert report["rejected"] == 20
+    assert len(report["errors"]) == 5
+
+def test_batch_rejected_by_database_is_retried_row_by_row():
+    inserted = []
+    def insert(batch):
+        if any(r["serial_no"] == "DUP" for r in batch): raise IntegrityError("duplicate serial")
+        inserted.extend(batch)
+    report = importer.import_csv(csv("item_name,serial_no", "A,SN1", "B,DUP", "C,SN3"), "hardware", insert)
+    assert [r["item_name"] for r in inserted] == ["A", "C"]
+    assert report["inserted"] == 2 and report["rejected"] == 1
+    assert report["errors"].iloc[0]["row"] == 3
+
+def test_passwords_are_not_trimmed():
+    batches = []
+    importer.import_csv(csv("username , password", "  alice , secret  "), "users", batches.append)
+    assert batches[0] == [{"username": "alice", "password": " secret  ", "role": "user"}]
+
+def test_connection_failure_aborts_instead_of_retrying_every_row(monkeypatch):
+    monkeypatch.setattr(importer, "CHUNK_ROWS", 4)
+    monkeypatch.setattr(importer, "INSERT_BATCH", 3)
+    calls = []
+    def insert(batch):
+        calls.append(len(batch))
+        if len(calls) > 1: raise ConnectionError("server closed the connection")
+    rows = [f"Laptop {i},SN{i}" for i in range(10)]
+    report = importer.import_csv(csv("item_name,serial_no", *rows), "hardware", insert)
+    assert calls == [3, 3]
+    assert report["inserted"] == 3 and report["not_attempted"] == 7
+    assert "server closed" in report["aborted"]
+
+def test_unclassified_failure_aborts_after_first_single_row_try():
+    calls = []
+    def insert(batch):
+        calls.append(len(batch))
+        raise RuntimeError("could not connect to server")
+    report = importer.import_csv(csv("item_name,serial_no", "A,1", "B,2", "C,3"), "hardware", insert)
+    assert calls == [3, 1]
+    assert report["not_attempted"] == 3 and report["rejected"] == 0
+
+def test_constraint_errors_are_recognised():
+    assert importer.is_row_error(IntegrityError("duplicate key"))
+    err = Exception("violates check constraint"); err.code = "23514"
+    assert importer.is_row_error(err)
+    assert not importer.is_row_error(RuntimeError("timeout"))
@@ -0,0 +1,60 @@
+import json
+import logs
+
+def make_writer(tmp_path, sink):
+    return logs.AuditLogWriter(sink, spool_path=str(tmp_path / "spool.jsonl"))
+
+def test_corrupt_spool_line_does_not_stop_later_rows(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    # A crash mid-spill leaves a truncated last line behind
+    spool.write_text(json.dumps({"action": "Spooled"}) + "\n" + '{"action": "Trunc', encoding="utf-8")
+    written = []
+    writer = make_writer(tmp_path, written.extend)
+    writer.submit({"action": "First"})
+    assert writer.flush(timeout=5)
+    writer.submit({"action": "Second"})
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert [r["action"] for r in written] == ["First", "Spooled", "Second"]
+    assert not spool.exists() and not (tmp_path / "spool.jsonl.replay").exists()
+
+def test_leftover_replay_file_is_merged_on_start(tmp_path):
+    (tmp_path / "spool.jsonl.replay").write_text(json.dumps({"action": "Orphaned"}) + "\n", encoding="utf-8")
+    written = []
+    writer = make_writer(tmp_path, written.extend)
+    writer.submit({"action": "New"})
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert sorted(r["action"] for r in written) == ["New", "Orphaned"]
+
+def test_worker_survives_failing_callback(tmp_path):
+    written = []
+    def boom(): raise RuntimeError("callback failed")
+    writer = logs.AuditLogWriter(written.extend, on_written=boom, spool_path=str(tmp_path / "spool.jsonl"))
+    writer.submit({"action": "A"})
+    assert writer.flush(timeout=5)
+    writer.submit({"action": "B"})
+    assert writer.flush(timeout=5)
+    writer.close()
+    assert [r["action"] for r in written] == ["A", "B"]
+
+def test_client_ip_from_forwarded_headers():
+    assert logs.resolve_client_ip({"X-Forwarded-For": "203.0.113.7, 10.0.0.2"}) == "203.0.113.7"
+    assert logs.resolve_client_ip({"Forwarded": 'for="[2001:db8::1]:4711";proto=https, for=10.0.0.2'}) == "2001:db8::1"
+    assert logs.resolve_client_ip({"X-Real-IP": "198.51.100.4:8080"}) == "198.51.100.4"
+
+def test_trusted_hops_ignore_client_supplied_entries():
+    # The client prepended a fake address; two trusted proxies appended the real ones
+    headers = {"X-Forwarded-For": "1.2.3.4, 203.0.113.7, 10.0.0.2"}
+    assert logs.resolve_client_ip(headers, trusted_hops=2) == "203.0.113.7"
+    assert logs.resolve_client_ip(headers, trusted_hops=9) == "1.2.3.4"
+
+def test_client_ip_falls_back_to_peer():
+    assert logs.resolve_client_ip({"X-Forwarded-For": "not-an-ip"}, peer_ip="192.0.2.1") == "192.0.2.1"
+    assert logs.resolve_client_ip({}) == "Unknown"
+
+def test_client_supplied_header_cannot_override_trusted_chain():
+    headers = {"X-Forwarded-For": "203.0.113.7, 10.0.0.2", "Forwarded": "for=6.6.6.6"}
+    assert logs.resolve_client_ip(headers, trusted_hops=2) == "203.0.113.7"
+    assert logs.resolve_client_ip(headers, trusted_hops=1, header="Forwarded") == "6.6.6.6"
+    assert logs.resolve_client_ip({"X-Real-IP": "6.6.6.6"}, peer_ip="10.0.0.2", trusted_hops=1) == "10.0.0.2"
@@ -0,0 +1,24 @@
+import passwords
+
+def test_scrypt_workers_fit_the_memory_budget(monkeypatch):
+    monkeypatch.setattr(passwords, "HASH_WORKERS", 8)
+    monkeypatch.setattr(passwords, "_auth_config", lambda: {})
+    monkeypatch.setattr(passwords, "get_policy", lambda: ("scrypt", 17))  # 128 MiB per hash
+    assert passwords.hash_workers() == 2
+    monkeypatch.setattr(passwords, "get_policy", lambda: ("scrypt", 14))  # 16 MiB per hash
+    assert passwords.hash_workers() == 8
+    monkeypatch.setattr(passwords, "_auth_config", lambda: {"hash_memory_mb": 64})
+    monkeypatch.setattr(passwords, "get_policy", lambda: ("scrypt", 17))
+    assert passwords.hash_workers() == 1
+
+def test_bcrypt_uses_every_worker(monkeypatch):
+    monkeypatch.setattr(passwords, "HASH_WORKERS", 8)
+    monkeypatch.setattr(passwords, "get_policy", lambda: ("bcrypt", 10))
+    assert passwords.hash_workers() == 8
+
+def test_hash_passwords_keeps_input_order(monkeypatch):
+    monkeypatch.setattr(passwords, "_auth_config", lambda: {})
+    monkeypatch.setattr(passwords, "get_policy", lambda: ("scrypt", 14))
+    pws = [f"pw{i}" for i in range(6)]
+    hashes = passwords.hash_passwords(pws)
+    assert all(passwords.verify_password(pw, h) for pw, h in zip(pws, hashes))
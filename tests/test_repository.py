@@ -0,0 +1,38 @@
+from repository import SqliteRepository
+
+def test_assign_hardware_reports_duplicate_ids_as_conflicts():
+    repo = SqliteRepository()
+    staff = [s["id"] for s in repo.insert("staff", [{"full_name": "A"}, {"full_name": "B"}])]
+    hw = [h["id"] for h in repo.insert("hardware", [{"item_name": "Laptop"}, {"item_name": "Monitor"}])]
+    pairs = [{"hardware_id": hw[0], "staff_id": staff[0]}, {"hardware_id": hw[0], "staff_id": staff[1]},
+             {"hardware_id": hw[1], "staff_id": staff[1]}]
+    result = repo.rpc("assign_hardware", {"p_pairs": pairs, "p_user": "admin"})
+    assert result["assigned"] == [{"hardware_id": hw[0], "staff_id": staff[0]}, {"hardware_id": hw[1], "staff_id": staff[1]}]
+    assert result["conflicts"] == [hw[0]]
+    assert repo.get("hardware", hw[0])["assigned_to_id"] == staff[0]
+
+def test_iter_pages_walks_every_row_once():
+    repo = SqliteRepository()
+    repo.insert("assets", [{"item_name": f"A{i}"} for i in range(7)])
+    pages = list(repo.iter_pages("assets", page_size=3, columns="id, item_name"))
+    assert [len(p) for p in pages] == [3, 3, 1]
+    assert [r["item_name"] for p in pages for r in p] == [f"A{i}" for i in range(7)]
+
+def test_keyset_cursor_breaks_ties_on_the_second_column():
+    repo = SqliteRepository()
+    # Five entries share one timestamp, so paging by timestamp alone would skip or repeat rows
+    repo.insert("logs", [{"timestamp": "2024-01-01T00:00:00", "action": f"L{i}"} for i in range(5)]
+                        + [{"timestamp": "2024-01-02T00:00:00", "action": "Later"}])
+    seen, after = [], None
+    while True:
+        rows = repo.select("logs", order_by=("timestamp", "id"), desc=True, after=after, limit=2)
+        if not rows: break
+        seen += [r["action"] for r in rows]
+        after = (rows[-1]["timestamp"], rows[-1]["id"])
+    assert seen == ["Later", "L4", "L3", "L2", "L1", "L0"]
+
+def test_keyset_pages_respect_filters():
+    repo = SqliteRepository()
+    repo.insert("hardware", [{"item_name": f"H{i}", "status": "Broken" if i % 2 else "Available"} for i in range(6)])
+    pages = list(repo.iter_pages("hardware", page_size=2, filters=[("eq", "status", "Broken")]))
+    assert [r["item_name"] for p in pages for r in p] == ["H1", "H3", "H5"]
@@ -0,0 +1,42 @@
+import gzip
+import pytest
+import retention
+
+@pytest.fixture
+def repo(sqlite_repo, monkeypatch, tmp_path):
+    repo = sqlite_repo(retention)
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path))
+    repo.insert("logs", [{"timestamp": f"2020-01-0{d}T10:00:00", "user": "a", "action": "Login"} for d in range(1, 4)]
+                        + [{"user": "a", "action": "Login"}])  # recent, stays
+    return repo
+
+def archive_lines():
+    return [line for path in retention._month_files("2020-01")
+            for line in gzip.open(path, "rt", encoding="utf-8").read().splitlines()]
+
+def test_old_rows_move_to_monthly_file(repo):
+    assert retention.archive_logs(30) == 3
+    assert repo.count("logs") == 1
+    assert len(archive_lines()) == 3
+
+def test_failed_delete_is_raised_and_rerun_does_not_duplicate(repo, monkeypatch):
+    real_delete = repo.delete
+    def broken(table, filters): raise ConnectionError("connection reset")
+    monkeypatch.setattr(repo, "delete", broken)
+    with pytest.raises(ConnectionError):
+        retention.archive_logs(30)
+    assert repo.count("logs") == 4 and len(archive_lines()) == 3  # written, not deleted
+    monkeypatch.setattr(repo, "delete", real_delete)
+    assert retention.archive_logs(30) == 3
+    assert len(archive_lines()) == 3
+    assert len(retention.query_archive(retention.date(2020, 1, 1), retention.date(2020, 1, 31))) == 3
+
+def test_damaged_legacy_file_is_left_alone_and_still_readable(repo, tmp_path):
+    legacy = tmp_path / "logs-2020-01.jsonl.gz"
+    with gzip.open(legacy, "wt", encoding="utf-8") as f:
+        f.write('{"id": 100, "timestamp": "2020-01-05T00:00:00", "action": "Old"}\n{"id": 101, "timest')
+    with open(legacy, "ab") as f: f.write(gzip.compress(b'{"id": 102}\n')[:-8])  # member cut off mid-write
+    assert retention.archive_logs(30) == 3
+    found = retention.query_archive(retention.date(2020, 1, 1), retention.date(2020, 1, 31))
+    assert sorted(found["action"]) == ["Login", "Login", "Login", "Old"]
+    assert retention.archived_months() == ["2020-01"]
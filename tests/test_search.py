@@ -0,0 +1,50 @@
+import threading
+import pytest
+import search
+
+@pytest.fixture
+def repo(sqlite_repo):
+    repo = sqlite_repo()
+    repo.insert("assets", [{"item_name": "Dell Support Plan", "reference_no": "R-1"}])
+    repo.insert("hardware", [{"item_name": "Dell XPS", "serial_no": "SN-100"}, {"item_name": "ThinkPad", "serial_no": "SN-200"}])
+    repo.insert("staff", [{"full_name": "Wendell Smith", "employee_number": "E-7"}])
+    repo.insert("tickets", [{"subject": "Printer jam", "created_by": "bob"}])
+    return repo
+
+def test_global_search_merges_entities_by_score(repo):
+    hits, timed_out = search.global_search(repo, "dell")
+    assert timed_out == []
+    assert {(h["entity"], h["title"]) for h in hits} == {("assets", "Dell Support Plan"), ("hardware", "Dell XPS"),
+                                                        ("staff", "Wendell Smith")}
+    # Word-prefix matches rank above the substring hit inside "Wendell"
+    assert hits[-1]["entity"] == "staff"
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+def test_like_wildcards_in_the_query_match_literally(repo):
+    assert search.global_search(repo, "SN-%")[0] == []
+    assert [h["detail"] for h in search.global_search(repo, "SN-2")[0]] == ["SN-200"]
+
+def test_short_queries_are_not_sent(repo):
+    assert search.global_search(repo, "d") == ([], [])
+
+def test_slow_entity_is_reported_not_awaited(repo):
+    release = threading.Event()
+    real_rpc = repo.rpc
+    def rpc(name, params):
+        if name == "search_tickets": release.wait(5)
+        return real_rpc(name, params)
+    repo.rpc = rpc
+    try:
+        hits, timed_out = search.global_search(repo, "dell", budget=0.3)
+    finally:
+        release.set()
+    assert timed_out == ["tickets"]
+    assert {h["entity"] for h in hits} == {"assets", "hardware", "staff"}
+
+def test_searches_share_one_bounded_pool(repo, monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_WORKERS", 2)
+    monkeypatch.setattr(search, "_pool", None)
+    for _ in range(5): search.global_search(repo, "dell")
+    pool = search._executor()
+    assert pool._max_workers == 2 and len(pool._threads) <= 2
+    pool.shutdown()
@@ -0,0 +1,33 @@
+from datetime import date, timedelta
+import pytest
+import snapshots
+
+@pytest.fixture
+def repo(sqlite_repo):
+    return sqlite_repo(snapshots)
+
+def test_catch_up_fills_days_nobody_opened_the_dashboard(repo):
+    today = date.today()
+    repo.insert("daily_snapshots", [{"day": today - timedelta(days=5), "metric": "logins", "bucket": "", "value": 2}])
+    repo.insert("logs", [{"timestamp": f"{today - timedelta(days=3)}T09:00:00", "user": "a", "action": "Login"},
+                         {"timestamp": f"{today - timedelta(days=2)}T09:00:00", "user": "a", "action": "Login"}])
+    snapshots.take_snapshot()
+    series = snapshots.get_series("logins", today - timedelta(days=5), today)
+    assert series["logins"].tolist() == [2, 0, 1, 1, 0, 0]
+
+def test_catch_up_is_capped_by_lookback(repo):
+    today = date.today()
+    old = today - timedelta(days=snapshots.SNAPSHOT_LOOKBACK + 10)
+    repo.insert("logs", [{"timestamp": f"{old}T09:00:00", "user": "a", "action": "Login"}])
+    snapshots.take_snapshot()
+    assert not repo.select("daily_snapshots", filters=[("eq", "day", str(old))])
+
+def test_failed_run_is_not_cached(repo, monkeypatch):
+    real_rpc = repo.rpc
+    def broken(name, params): raise ConnectionError("database unavailable")
+    monkeypatch.setattr(repo, "rpc", broken)
+    assert snapshots.ensure_snapshots() is None
+    monkeypatch.setattr(repo, "rpc", real_rpc)
+    repo.insert("logs", [{"user": "a", "action": "Login"}])
+    assert snapshots.ensure_snapshots()
+    assert repo.count("daily_snapshots", [("eq", "metric", "logins")]) == 1